@@ -0,0 +1,68 @@
+"""Per-call latency of a product lookup: pooled connections vs. connect-per-call.
+
+Both sides run the same SELECT; the pooled side borrows a reader through
+InventoryDB._read(). get_product itself is normally answered by ProductCache
+without touching SQLite and is shown separately for reference.
+
+Run from the project root:
+
+    python -m benchmarks.bench_connection
+"""
+from __future__ import annotations
+
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from src.db_manager import InventoryDB, Product
+
+PRODUCTS = 200
+CALLS = 5000
+PRODUCT_SQL = "SELECT * FROM products WHERE barcode = ?"
+
+
+def _legacy_get_product(db_path: Path, barcode: str) -> sqlite3.Row | None:
+    # Mirrors the original behaviour: one fresh connection per query.
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    try:
+        return conn.execute(PRODUCT_SQL, (barcode,)).fetchone()
+    finally:
+        conn.close()
+
+
+def _pooled_get_product(db: InventoryDB, barcode: str) -> sqlite3.Row | None:
+    with db._read() as conn:
+        return conn.execute(PRODUCT_SQL, (barcode,)).fetchone()
+
+
+def _time_per_call(fn, barcodes: list[str]) -> float:
+    start = time.perf_counter()
+    for i in range(CALLS):
+        fn(barcodes[i % len(barcodes)])
+    return (time.perf_counter() - start) / CALLS * 1e6
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.db"
+        with InventoryDB(db_path) as db:
+            barcodes = [f"69{i:011d}" for i in range(PRODUCTS)]
+            for code in barcodes:
+                db.upsert_product(Product(code, f"商品{code}", "零食", 1.0, 2.0, 0))
+
+            legacy_us = _time_per_call(lambda code: _legacy_get_product(db_path, code), barcodes)
+            pooled_us = _time_per_call(lambda code: _pooled_get_product(db, code), barcodes)
+            cached_us = _time_per_call(db.get_product, barcodes)
+
+    print(f"product lookup x {CALLS}")
+    print(f"  connect-per-call : {legacy_us:8.1f} us/call")
+    print(f"  pooled reader    : {pooled_us:8.1f} us/call")
+    print(f"  speedup          : {legacy_us / pooled_us:8.1f}x")
+    print(f"  get_product (ProductCache, no SQL): {cached_us:8.1f} us/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Checkout latency of InventoryDB.stock_out for 1, 20 and 200 line carts.
+
+Run from the project root:
+
+    python -m benchmarks.bench_stock_out
+"""
+from __future__ import annotations
+
+import tempfile
+import time
+from pathlib import Path
+
+from src.db_manager import CartItem, InventoryDB, Product
+
+CART_SIZES = (1, 20, 200)
+ROUNDS = 50
+BATCHES_PER_PRODUCT = 3
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        with InventoryDB(Path(tmp) / "bench.db") as db:
+            barcodes = [f"69{i:011d}" for i in range(max(CART_SIZES))]
+            for code in barcodes:
+                db.upsert_product(Product(code, f"商品{code}", "零食", 1.0, 2.0, 0))
+                for batch in range(BATCHES_PER_PRODUCT):
+                    db.stock_in(
+                        code,
+                        quantity=ROUNDS * len(CART_SIZES),
+                        batch_no=f"B{batch}",
+                        expiry_date=f"2030-0{batch + 1}-01",
+                    )
+
+            print(f"stock_out, {ROUNDS} checkouts per cart size")
+            for size in CART_SIZES:
+                cart = [CartItem(barcode=code, quantity=2) for code in barcodes[:size]]
+                start = time.perf_counter()
+                for _ in range(ROUNDS):
+                    db.stock_out(cart)
+                elapsed_ms = (time.perf_counter() - start) / ROUNDS * 1e3
+                print(f"  {size:4d} lines : {elapsed_ms:8.2f} ms/checkout  {elapsed_ms * 1e3 / size:8.1f} us/line")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Cost of keeping stock_totals in sync: trigger vs. Python-side UPSERT.
+
+"python" drops trg_stock_logs_totals and issues the log INSERT plus a
+stock_totals UPSERT (with the low-stock flag) per line, as stock_in/stock_out
+used to; "trigger" issues only the log INSERT. Each size reports the best of
+REPEATS runs to damp timer noise.
+
+Run from the project root:
+
+    python -m benchmarks.bench_stock_totals
+"""
+from __future__ import annotations
+
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from src.db_manager import InventoryDB, Product
+
+PRODUCTS = 500
+ROUNDS = 200
+REPEATS = 5
+BATCH_LINES = (1, 20, 200)
+
+_INSERT_LOG = "INSERT INTO stock_logs (barcode, change_qty, type) VALUES (?, ?, '采购')"
+# Same work as the trigger, including the low-stock flag, issued from Python.
+_UPSERT_TOTAL = """
+    INSERT INTO stock_totals(barcode, current_qty, is_low)
+    VALUES (?1, ?2, ?2 < COALESCE((SELECT min_stock FROM products WHERE barcode = ?1), 0))
+    ON CONFLICT(barcode) DO UPDATE SET
+        current_qty = current_qty + excluded.current_qty,
+        is_low = current_qty + excluded.current_qty
+            < COALESCE((SELECT min_stock FROM products WHERE barcode = ?1), 0)
+"""
+
+
+def _write(conn: sqlite3.Connection, lines: list[tuple[str, int]], python_side: bool) -> None:
+    with conn:
+        conn.executemany(_INSERT_LOG, lines)
+        if python_side:
+            conn.executemany(_UPSERT_TOTAL, lines)
+
+
+def _run(db_path: Path, python_side: bool) -> dict[int, float]:
+    timings: dict[int, float] = {}
+    with InventoryDB(db_path) as db:
+        barcodes = [f"69{i:011d}" for i in range(PRODUCTS)]
+        for code in barcodes:
+            db.upsert_product(Product(code, f"商品{code}", "零食", 1.0, 2.0, 5))
+        conn = db._writer
+        if python_side:
+            conn.execute("DROP TRIGGER trg_stock_logs_totals")
+
+        for size in BATCH_LINES:
+            batches = [
+                [(barcodes[(r * size + i) % PRODUCTS], 1) for i in range(size)] for r in range(ROUNDS)
+            ]
+            best = float("inf")
+            for _ in range(REPEATS):
+                start = time.perf_counter()
+                for lines in batches:
+                    _write(conn, lines, python_side)
+                best = min(best, time.perf_counter() - start)
+            timings[size] = best / ROUNDS * 1e3
+
+        drift = conn.execute(
+            """
+            SELECT COUNT(1) FROM stock_totals t
+            WHERE t.current_qty != (SELECT COALESCE(SUM(change_qty), 0) FROM stock_logs l WHERE l.barcode = t.barcode)
+            """
+        ).fetchone()[0]
+        if drift:
+            raise SystemExit(f"{'python' if python_side else 'trigger'}: {drift} stock_totals rows drifted")
+    return timings
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {
+            "python": _run(Path(tmp) / "python.db", python_side=True),
+            "trigger": _run(Path(tmp) / "trigger.db", python_side=False),
+        }
+
+    print(f"stock_totals maintenance, best of {REPEATS} x {ROUNDS} transactions per size")
+    for size in BATCH_LINES:
+        python_ms, trigger_ms = results["python"][size], results["trigger"][size]
+        print(
+            f"  {size:4d} lines : python {python_ms:7.3f} ms  trigger {trigger_ms:7.3f} ms"
+            f"  ({trigger_ms / python_ms:5.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
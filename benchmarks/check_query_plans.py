@@ -0,0 +1,149 @@
+"""EXPLAIN QUERY PLAN regression check for report queries.
+
+Runs every report and warning entry point of InventoryDB against a small populated
+database (including one sealed monthly archive), captures the SQL it issues
+and fails (exit code 1) if any statement falls back to a full table scan, if
+a warning read (low stock, expiring batches) has to sort instead of walking an
+index in order, or if a range report reads more daily_rollups rows than the
+day totals.
+
+Run from the project root:
+
+    python -m benchmarks.check_query_plans
+"""
+from __future__ import annotations
+
+import re
+import sqlite3
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+
+from src.db_manager import CartItem, InventoryDB, Product
+
+ARCHIVED_DAY = date(2025, 3, 4)
+
+
+def _populate(db: InventoryDB) -> int:
+    for i in range(20):
+        code = f"69{i:011d}"
+        db.upsert_product(Product(code, f"商品{i}", "零食", 1.0, 2.0, 0))
+        db.stock_in(code, 10, batch_no="B1", expiry_date="2030-01-01")
+    db.stock_out([CartItem(f"69{i:011d}", 1) for i in range(5)])
+    with db._transaction() as conn:
+        conn.execute(
+            "INSERT INTO stock_logs (barcode, change_qty, type, timestamp) VALUES (?, 1, '采购', ?)",
+            ("6900000000000", ARCHIVED_DAY.isoformat() + " 10:00:00"),
+        )
+    db.archive_closed_month_logs()
+    return int(db.list_customer_orders()[0]["id"])
+
+
+def _capture(db: InventoryDB, statements: list[tuple[Path | None, str]]) -> None:
+    # Force one pooled reader into existence so its statements can be traced.
+    with db._read():
+        pass
+    for conn in [db._writer, *db._all_readers]:
+        conn.set_trace_callback(lambda sql: statements.append((None, sql)))
+
+    open_archive_for_read = db._open_archive_for_read
+
+    def traced_open(archive_path: Path) -> sqlite3.Connection:
+        archive_conn = open_archive_for_read(archive_path)
+        archive_conn.set_trace_callback(lambda sql: statements.append((archive_path, sql)))
+        return archive_conn
+
+    db._open_archive_for_read = traced_open
+
+
+# Scans over these are fine: table-valued functions and materialized subqueries.
+_ALLOWED_SCAN_TARGETS = ("json_each", "(", "CONSTANT")
+
+
+def _table_scans(conn: sqlite3.Connection, sql: str, ctes: set[str]) -> list[str]:
+    scans = []
+    for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall():
+        detail = str(row[3])
+        if not detail.startswith("SCAN "):
+            continue
+        target = detail.split()[1]
+        if target.startswith(_ALLOWED_SCAN_TARGETS) or target in ctes:
+            continue
+        scans.append(detail)
+    return scans
+
+
+def _temp_sorts(conn: sqlite3.Connection, sql: str) -> list[str]:
+    return [
+        str(row[3])
+        for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        if str(row[3]).startswith("USE TEMP B-TREE")
+    ]
+
+
+def _not_day_totals_only(conn: sqlite3.Connection, sql: str) -> list[str]:
+    details = [str(row[3]) for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()]
+    return [detail for detail in details if "daily_rollups" in detail and "barcode=?" not in detail]
+
+
+def _cte_names(sql: str) -> set[str]:
+    return set(re.findall(r"(\w+)\s+AS\s*\(", sql, flags=re.IGNORECASE))
+
+
+def main() -> int:
+    with tempfile.TemporaryDirectory() as tmp:
+        with InventoryDB(Path(tmp) / "plans.db") as db:
+            order_id = _populate(db)
+            statements: list[tuple[Path | None, str]] = []
+            _capture(db, statements)
+
+            for day in (date.today(), ARCHIVED_DAY):
+                db.get_daily_summary(for_date=day)
+                db.get_daily_transactions(for_date=day)
+                db.list_customer_orders(for_date=day)
+            range_from = len(statements)
+            db.get_range_summary(ARCHIVED_DAY, date.today())
+            db.list_daily_rollups(ARCHIVED_DAY, date.today())
+            range_reads = {sql for _, sql in statements[range_from:]}
+            list(db.iter_logs(ARCHIVED_DAY, date.today(), types=["销售"]))
+            db.get_customer_order_items(order_id)
+            warnings_from = len(statements)
+            db.get_low_stock_products()
+            db.get_expiring_batches(within_days=3650)
+            warning_reads = {sql for _, sql in statements[warnings_from:]}
+
+            for conn in [db._writer, *db._all_readers]:
+                conn.set_trace_callback(None)
+
+            failures = []
+            for archive_path, sql in dict.fromkeys(statements):
+                if not sql.lstrip().upper().startswith(("SELECT", "WITH")):
+                    continue
+                if archive_path is None:
+                    with db._read() as conn:
+                        scans = _table_scans(conn, sql, _cte_names(sql))
+                        if sql in warning_reads:
+                            scans += _temp_sorts(conn, sql)
+                        if sql in range_reads:
+                            scans += _not_day_totals_only(conn, sql)
+                else:
+                    archive_conn = sqlite3.connect(archive_path)
+                    try:
+                        scans = _table_scans(archive_conn, sql, _cte_names(sql))
+                    finally:
+                        archive_conn.close()
+                if scans:
+                    failures.append((sql, scans))
+
+    if failures:
+        for sql, scans in failures:
+            print("BAD PLAN:", "; ".join(scans))
+            print("  " + " ".join(sql.split()))
+        return 1
+    print(f"ok: {len(statements)} report statements use indexes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""Release benchmark suite: times core InventoryDB paths on a synthetic store.
+
+Generates a store (see benchmarks.synthetic_store), times checkout, receiving,
+reports, inventory/warning reads and archive reads, writes the timings as JSON
+and compares them with a saved baseline. The exit code is 1 when any operation's
+median got slower than the baseline by more than --threshold.
+
+Run from the project root:
+
+    python -m benchmarks.run_suite --scale small --save-baseline   # on the old release
+    python -m benchmarks.run_suite --scale small                   # on the new one
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import math
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable
+
+from benchmarks.synthetic_store import StoreSpec, add_spec_arguments, build_store, spec_from_args
+from config import EXPIRY_WARNING_DAYS
+from src.db_manager import CartItem, InventoryDB, StockInLine
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_REPEAT = 30
+# Fast calls are looped until one sample takes at least this long, so that
+# sub-millisecond operations are not dominated by timer and scheduler noise.
+MIN_SAMPLE_MS = 5.0
+MAX_CALLS_PER_SAMPLE = 1000
+
+
+def _time(fn: Callable[[], Any], repeat: int) -> dict[str, float]:
+    start = time.perf_counter()
+    fn()  # also warms caches and pooled connections
+    first_ms = (time.perf_counter() - start) * 1e3
+    calls = max(1, min(MAX_CALLS_PER_SAMPLE, math.ceil(MIN_SAMPLE_MS / max(first_ms, 1e-3))))
+
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        samples.append((time.perf_counter() - start) * 1e3 / calls)
+    samples.sort()
+    return {
+        "runs": repeat,
+        "calls_per_run": calls,
+        "min_ms": round(samples[0], 4),
+        "p50_ms": round(statistics.median(samples), 4),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 4),
+        "mean_ms": round(statistics.fmean(samples), 4),
+    }
+
+
+def _read_operations(db: InventoryDB, spec: StoreSpec) -> list[tuple[str, Callable[[], Any]]]:
+    today = date.today()
+    archived_day = today.replace(day=1) - timedelta(days=1)
+    month_start = archived_day.replace(day=1)
+    operations: list[tuple[str, Callable[[], Any]]] = [
+        ("get_daily_summary", lambda: db.get_daily_summary(for_date=today)),
+        ("get_range_summary", lambda: db.get_range_summary(month_start, today)),
+        ("list_products_with_stock", db.list_products_with_stock),
+        ("get_expiring_batches", lambda: db.get_expiring_batches(within_days=EXPIRY_WARNING_DAYS)),
+        ("get_low_stock_products", db.get_low_stock_products),
+        ("get_daily_transactions", lambda: db.get_daily_transactions(for_date=today)),
+    ]
+    if spec.months > 1:
+        operations += [
+            ("archive_get_daily_summary", lambda: db.get_daily_summary(for_date=archived_day)),
+            ("archive_get_daily_transactions", lambda: db.get_daily_transactions(for_date=archived_day)),
+            ("archive_iter_logs_month", lambda: sum(1 for _ in db.iter_logs(month_start, archived_day))),
+        ]
+    return operations
+
+
+def _write_operations(db: InventoryDB, spec: StoreSpec) -> list[tuple[str, Callable[[], Any]]]:
+    barcodes = db.list_product_barcodes()
+    # Looped checkouts must never hit 库存不足, whatever the generated history left.
+    db.stock_in_many(StockInLine(barcode, 100000) for barcode in barcodes)
+
+    lines = max(1, min(spec.lines_per_order, len(barcodes)))
+    carts = itertools.cycle(
+        [CartItem(barcode, 1) for barcode in barcodes[i : i + lines]]
+        for i in range(0, len(barcodes) - lines + 1, lines)
+    )
+    receipts = itertools.cycle(barcodes)
+    return [
+        ("stock_in", lambda: db.stock_in(next(receipts), 1)),
+        ("stock_out", lambda: db.stock_out(next(carts))),
+    ]
+
+
+def run(spec: StoreSpec, repeat: int) -> dict[str, Any]:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "store.db"
+        store = build_store(db_path, spec)
+        with InventoryDB(db_path) as db:
+            # Reads first, on the store exactly as generated; the writes change it.
+            results = {name: _time(fn, repeat) for name, fn in _read_operations(db, spec)}
+            results.update((name, _time(fn, repeat)) for name, fn in _write_operations(db, spec))
+    return {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "repeat": repeat,
+        },
+        "store": store,
+        "results": results,
+    }
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[str]:
+    """Print a p50 comparison table; returns the names of regressed operations."""
+    if current["store"]["spec"] != baseline["store"]["spec"]:
+        print("note: baseline was recorded on a different store spec; ratios are not comparable")
+    regressions = []
+    print(f"{'operation':32s} {'baseline p50':>13s} {'current p50':>12s} {'ratio':>7s}")
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"{name:32s} {'-':>13s} {result['p50_ms']:10.3f}ms {'new':>7s}")
+            continue
+        ratio = result["p50_ms"] / before["p50_ms"] if before["p50_ms"] > 0 else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            regressions.append(name)
+            flag = "  SLOWER"
+        print(f"{name:32s} {before['p50_ms']:11.3f}ms {result['p50_ms']:10.3f}ms {ratio:6.2f}x{flag}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_spec_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--output", type=Path, help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="also store these results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed p50 slowdown, 0.2 = 20%%")
+    args = parser.parse_args()
+
+    current = run(spec_from_args(args), max(1, args.repeat))
+    output = args.output or RESULTS_DIR / f"{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(current, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"store built in {current['store']['seconds']}s; results written to {output}")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(current, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"baseline saved to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        for name, result in current["results"].items():
+            print(f"{name:32s} p50 {result['p50_ms']:10.3f}ms  p95 {result['p95_ms']:10.3f}ms")
+        print(f"no baseline at {args.baseline}; rerun with --save-baseline to record one")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    regressions = compare(current, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} operation(s) slower than baseline by more than {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
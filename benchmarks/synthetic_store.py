@@ -0,0 +1,198 @@
+"""Synthetic store generator for the benchmark suite.
+
+Builds a store of a given scale through the real InventoryDB write paths
+(upsert_products, stock_in_many, stock_out), one simulated day at a time.
+Each day's rows are then re-stamped onto that day, daily_rollups are rebuilt
+and, unless disabled, every closed month is archived like in production.
+The same spec and seed always give the same catalog, deliveries and carts.
+
+Generate a store to inspect by hand:
+
+    python -m benchmarks.synthetic_store /tmp/store.db --scale small
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from dataclasses import asdict, dataclass, replace
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any
+
+from src.db_manager import CartItem, InventoryDB, Product, StockInLine
+
+
+@dataclass(frozen=True)
+class StoreSpec:
+    skus: int = 2000
+    # Months of history ending with the current month; closed months are archived.
+    months: int = 3
+    orders_per_day: int = 40
+    lines_per_order: int = 5
+    # Expiry batches received per SKU on the first day.
+    expiry_batches: int = 2
+    seed: int = 7
+
+
+SCALES = {
+    "tiny": StoreSpec(skus=200, months=2, orders_per_day=10, lines_per_order=3),
+    "small": StoreSpec(),
+    "medium": StoreSpec(skus=10000, months=6, orders_per_day=150, lines_per_order=6),
+    "large": StoreSpec(skus=30000, months=12, orders_per_day=400, lines_per_order=8),
+}
+
+CATEGORIES = ("零食", "饮料", "日用", "粮油", "冷冻", "烟酒")
+# Share of the catalog re-delivered each day after the opening stock-take.
+DAILY_DELIVERY_SHARE = 0.02
+
+
+def barcode_for(i: int) -> str:
+    return f"69{i:011d}"
+
+
+def history_days(spec: StoreSpec, today: date | None = None) -> list[date]:
+    today = today or date.today()
+    first = today.replace(day=1)
+    for _ in range(spec.months - 1):
+        first = (first - timedelta(days=1)).replace(day=1)
+    return [first + timedelta(days=n) for n in range((today - first).days + 1)]
+
+
+def _restamp(db: InventoryDB, day: date, marks: dict[str, int]) -> None:
+    """Move every row written since marks onto day, keeping the time of day."""
+    prefix = day.isoformat()
+    with db._transaction() as conn:
+        conn.execute(
+            "UPDATE stock_logs SET timestamp = ? || ' ' || time(timestamp) WHERE id > ?",
+            (prefix, marks["stock_logs"]),
+        )
+        conn.execute(
+            "UPDATE sales_orders SET timestamp = ? || ' ' || time(timestamp) WHERE id > ?",
+            (prefix, marks["sales_orders"]),
+        )
+        conn.execute(
+            """
+            UPDATE customer_orders
+            SET created_at = ? || ' ' || time(created_at), updated_at = ? || ' ' || time(updated_at)
+            WHERE id > ?
+            """,
+            (prefix, prefix, marks["customer_orders"]),
+        )
+
+
+def _marks(db: InventoryDB) -> dict[str, int]:
+    with db._read() as conn:
+        return {
+            table: int(conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0])
+            for table in ("stock_logs", "sales_orders", "customer_orders")
+        }
+
+
+def _catalog(spec: StoreSpec, rng: random.Random) -> list[Product]:
+    products = []
+    for i in range(spec.skus):
+        purchase = round(rng.uniform(0.5, 40.0), 2)
+        products.append(
+            Product(
+                barcode=barcode_for(i),
+                name=f"{CATEGORIES[i % len(CATEGORIES)]}商品{i}",
+                category=CATEGORIES[i % len(CATEGORIES)],
+                purchase_price=purchase,
+                retail_price=round(purchase * rng.uniform(1.1, 1.6), 2),
+                min_stock=rng.choice((0, 5, 10, 20)),
+            )
+        )
+    return products
+
+
+def _opening_stock(spec: StoreSpec, days: list[date], rng: random.Random) -> list[StockInLine]:
+    # Enough that carts rarely run a product dry over the whole history.
+    expected_sales = len(days) * spec.orders_per_day * spec.lines_per_order * 2 // max(spec.skus, 1)
+    per_batch = max(20, expected_sales // max(spec.expiry_batches, 1) + 10)
+    lines = []
+    for i in range(spec.skus):
+        for batch in range(spec.expiry_batches):
+            expiry = days[-1] + timedelta(days=rng.randint(-10, 400))
+            lines.append(StockInLine(barcode_for(i), per_batch, f"B{batch}", expiry.isoformat()))
+    return lines
+
+
+def build_store(db_path: Path, spec: StoreSpec, archive: bool = True) -> dict[str, Any]:
+    """Populate a fresh database at db_path; returns what was generated and how long it took."""
+    rng = random.Random(spec.seed)
+    days = history_days(spec)
+    started = time.perf_counter()
+    checkouts = 0
+    sold_out = 0
+
+    with InventoryDB(db_path) as db:
+        db.upsert_products(_catalog(spec, rng))
+
+        for n, day in enumerate(days):
+            marks = _marks(db)
+            if n == 0:
+                db.stock_in_many(_opening_stock(spec, days, rng))
+            else:
+                delivery = rng.sample(range(spec.skus), max(1, int(spec.skus * DAILY_DELIVERY_SHARE)))
+                db.stock_in_many(
+                    StockInLine(
+                        barcode_for(i),
+                        rng.randint(5, 30),
+                        f"D{n}",
+                        (day + timedelta(days=rng.randint(30, 365))).isoformat(),
+                    )
+                    for i in delivery
+                )
+
+            for _ in range(spec.orders_per_day):
+                lines = rng.sample(range(spec.skus), min(spec.lines_per_order, spec.skus))
+                cart = [CartItem(barcode_for(i), rng.randint(1, 3)) for i in lines]
+                try:
+                    db.stock_out(cart)
+                    checkouts += 1
+                except ValueError:
+                    sold_out += 1
+            _restamp(db, day, marks)
+
+        db.rebuild_daily_rollups()
+        archived_rows = db.archive_closed_month_logs() if archive else 0
+
+    return {
+        "spec": asdict(spec),
+        "days": [days[0].isoformat(), days[-1].isoformat()],
+        "checkouts": checkouts,
+        "sold_out_carts": sold_out,
+        "archived_rows": archived_rows,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def add_spec_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    for name in StoreSpec.__dataclass_fields__:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, dest=name, help="overrides --scale")
+
+
+def spec_from_args(args: argparse.Namespace) -> StoreSpec:
+    overrides = {
+        name: getattr(args, name) for name in StoreSpec.__dataclass_fields__ if getattr(args, name) is not None
+    }
+    return replace(SCALES[args.scale], **overrides)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("db_path", type=Path)
+    parser.add_argument("--no-archive", action="store_true")
+    add_spec_arguments(parser)
+    args = parser.parse_args()
+
+    if args.db_path.exists():
+        raise SystemExit(f"{args.db_path} already exists")
+    summary = build_store(args.db_path, spec_from_args(args), archive=not args.no_archive)
+    print(summary)
+
+
+if __name__ == "__main__":
+    main()
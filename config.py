@@ -7,3 +7,66 @@ SCHEMA_PATH = DB_DIR / "schema.sql"
 REPORTS_DIR = BASE_DIR / "reports"
 
 EXPIRY_WARNING_DAYS = 15
+DB_READER_POOL_SIZE = 4
+# Longest wait for a free pooled reader before a read fails instead of hanging.
+DB_READER_ACQUIRE_TIMEOUT_S = 10
+PRODUCT_CACHE_MAX_ENTRIES = 50000
+COMPLETION_LIMIT = 20
+# Pause after the last keystroke before completion also runs a full-text search.
+COMPLETION_SEARCH_DELAY_MS = 150
+SEARCH_LIMIT = 50
+ARCHIVE_CHUNK_SIZE = 2000
+# Lines per transaction when importing supplier delivery CSVs.
+STOCK_IN_IMPORT_CHUNK_SIZE = 500
+# Products per transaction when importing a catalog CSV.
+CATALOG_IMPORT_CHUNK_SIZE = 2000
+# Barcode scanners type a whole code in a burst; keys further apart than this
+# are treated as human typing.
+SCANNER_MAX_KEY_INTERVAL_MS = 50
+SCANNER_MIN_CODE_LENGTH = 4
+
+# SQLite PRAGMA profiles applied by InventoryDB to every connection it opens.
+# "balanced" is the default: WAL lets report reads run alongside checkout
+# writes, and synchronous=NORMAL only fsyncs at WAL checkpoints.
+DB_PERFORMANCE_PROFILES: dict[str, dict[str, int | str]] = {
+    "safe": {
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "temp_store": "DEFAULT",
+        "busy_timeout": 5000,
+    },
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16000,
+        "mmap_size": 64 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -64000,
+        "mmap_size": 256 * 1024 * 1024,
+        "temp_store": "MEMORY",
+        "busy_timeout": 10000,
+    },
+}
+DB_PERFORMANCE_PROFILE = "balanced"
+
+# Opt-in query timing (diagnostics dialog). Statements slower than the threshold
+# are appended to a rotating slow-query log.
+SLOW_QUERY_THRESHOLD_MS = 50
+SLOW_QUERY_LOG_PATH = BASE_DIR / "logs" / "slow_queries.log"
+SLOW_QUERY_LOG_MAX_BYTES = 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 3
+
+# GUI responsiveness telemetry: the event loop is probed every interval and a
+# probe arriving later than the stall threshold counts as a stall. Latency
+# histograms are written to the metrics file periodically and on exit.
+GUI_LAG_PROBE_INTERVAL_MS = 50
+GUI_STALL_THRESHOLD_MS = 100
+GUI_METRICS_PATH = BASE_DIR / "logs" / "gui_metrics.json"
+GUI_METRICS_EXPORT_INTERVAL_MS = 5 * 60 * 1000
@@ -18,9 +18,11 @@ CREATE TABLE IF NOT EXISTS stock_logs (
     FOREIGN KEY (sale_order_id) REFERENCES sales_orders (id)
 );
 
+-- Maintained by the triggers at the end of this file; is_low = current_qty < min_stock.
 CREATE TABLE IF NOT EXISTS stock_totals (
     barcode TEXT PRIMARY KEY,
     current_qty INTEGER NOT NULL DEFAULT 0,
+    is_low INTEGER NOT NULL DEFAULT 0,
     FOREIGN KEY (barcode) REFERENCES products (barcode)
 );
 
@@ -73,6 +75,137 @@ CREATE TABLE IF NOT EXISTS customer_order_items (
     FOREIGN KEY (customer_order_id) REFERENCES customer_orders (id) ON DELETE CASCADE
 );
 
+-- Pre-aggregated report figures, maintained in the same transaction as each write.
+-- barcode = '' holds the day total (net of order discounts); other rows are per product.
+CREATE TABLE IF NOT EXISTS daily_rollups (
+    day TEXT NOT NULL,
+    barcode TEXT NOT NULL,
+    sales_qty INTEGER NOT NULL DEFAULT 0,
+    sales_revenue REAL NOT NULL DEFAULT 0,
+    sales_cost REAL NOT NULL DEFAULT 0,
+    purchase_qty INTEGER NOT NULL DEFAULT 0,
+    purchase_cost REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, barcode)
+);
+
+-- Range reports read only the day-total rows (barcode = ''); with barcode first
+-- they touch one row per day instead of every product's row in the range.
+CREATE INDEX IF NOT EXISTS idx_daily_rollups_barcode_day ON daily_rollups(barcode, day);
+
+-- Checkpoint of the chunked monthly archiving job (see InventoryDB.archive_closed_month_logs).
+CREATE TABLE IF NOT EXISTS archive_progress (
+    month_key TEXT PRIMARY KEY,
+    archived_rows INTEGER NOT NULL DEFAULT 0,
+    last_source_id INTEGER,
+    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    completed_at DATETIME
+);
+
+-- Current warnings, kept up to date by the triggers at the end of this file so the
+-- UI reads them instead of recomputing over the catalog. kind = 'low_stock' has one
+-- row per product under min_stock; kind = 'expiry' one row per batch with stock left
+-- (how close to expiry is decided at read time, as it depends on today's date).
+CREATE TABLE IF NOT EXISTS stock_alerts (
+    kind TEXT NOT NULL,
+    barcode TEXT NOT NULL,
+    batch_no TEXT NOT NULL DEFAULT '',
+    expiry_date TEXT NOT NULL DEFAULT '',
+    current_qty INTEGER NOT NULL,
+    PRIMARY KEY (kind, barcode, batch_no, expiry_date)
+);
+
+-- kind first, then the column each warning read sorts (and for expiry, ranges) on,
+-- so the reads walk one index in order instead of sorting.
+CREATE INDEX IF NOT EXISTS idx_stock_alerts_kind_qty ON stock_alerts(kind, current_qty);
+CREATE INDEX IF NOT EXISTS idx_stock_alerts_kind_expiry ON stock_alerts(kind, expiry_date);
+
+-- Full-text product search (see InventoryDB.search_products). products has no
+-- INTEGER PRIMARY KEY, so product_search_ids gives each barcode a stable FTS rowid.
+-- barcode/chars/category hold one token per character so any substring is a phrase match;
+-- initials holds the pinyin initials of the name (可口可乐 -> k k k l).
+CREATE TABLE IF NOT EXISTS product_search_ids (
+    id INTEGER PRIMARY KEY,
+    barcode TEXT NOT NULL UNIQUE
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(barcode, chars, category, initials);
+
 CREATE INDEX IF NOT EXISTS idx_stock_logs_timestamp ON stock_logs(timestamp);
 CREATE INDEX IF NOT EXISTS idx_sales_orders_timestamp ON sales_orders(timestamp);
 CREATE INDEX IF NOT EXISTS idx_customer_orders_created_at ON customer_orders(created_at);
+CREATE INDEX IF NOT EXISTS idx_sales_order_items_order_id ON sales_order_items(order_id);
+CREATE INDEX IF NOT EXISTS idx_customer_order_items_order_id ON customer_order_items(customer_order_id);
+CREATE INDEX IF NOT EXISTS idx_expiry_management_open
+    ON expiry_management(barcode, expiry_date, batch_no) WHERE current_qty > 0;
+
+-- stock_totals follows stock_logs inside the engine, so every writer stays consistent.
+-- Deleting logs is how monthly archiving moves them out, so deletes leave totals alone.
+CREATE TRIGGER IF NOT EXISTS trg_stock_logs_totals
+AFTER INSERT ON stock_logs
+BEGIN
+    INSERT INTO stock_totals (barcode, current_qty, is_low)
+    VALUES (
+        NEW.barcode,
+        NEW.change_qty,
+        NEW.change_qty < COALESCE((SELECT min_stock FROM products WHERE barcode = NEW.barcode), 0)
+    )
+    ON CONFLICT(barcode) DO UPDATE SET
+        current_qty = current_qty + excluded.current_qty,
+        is_low = current_qty + excluded.current_qty
+            < COALESCE((SELECT min_stock FROM products WHERE barcode = NEW.barcode), 0);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_products_stock_totals
+AFTER INSERT ON products
+BEGIN
+    INSERT OR IGNORE INTO stock_totals (barcode, current_qty, is_low)
+    VALUES (NEW.barcode, 0, 0 < NEW.min_stock);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_products_min_stock
+AFTER UPDATE OF min_stock ON products
+BEGIN
+    UPDATE stock_totals SET is_low = current_qty < NEW.min_stock WHERE barcode = NEW.barcode;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stock_totals_alert_insert
+AFTER INSERT ON stock_totals
+WHEN NEW.is_low = 1
+BEGIN
+    INSERT INTO stock_alerts (kind, barcode, current_qty)
+    VALUES ('low_stock', NEW.barcode, NEW.current_qty)
+    ON CONFLICT(kind, barcode, batch_no, expiry_date) DO UPDATE SET current_qty = excluded.current_qty;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_stock_totals_alert_update
+AFTER UPDATE OF current_qty, is_low ON stock_totals
+BEGIN
+    DELETE FROM stock_alerts
+    WHERE NEW.is_low = 0 AND kind = 'low_stock' AND barcode = NEW.barcode;
+    INSERT INTO stock_alerts (kind, barcode, current_qty)
+    SELECT 'low_stock', NEW.barcode, NEW.current_qty WHERE NEW.is_low = 1
+    ON CONFLICT(kind, barcode, batch_no, expiry_date) DO UPDATE SET current_qty = excluded.current_qty;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_expiry_alert_insert
+AFTER INSERT ON expiry_management
+WHEN NEW.current_qty > 0
+BEGIN
+    INSERT INTO stock_alerts (kind, barcode, batch_no, expiry_date, current_qty)
+    VALUES ('expiry', NEW.barcode, NEW.batch_no, NEW.expiry_date, NEW.current_qty)
+    ON CONFLICT(kind, barcode, batch_no, expiry_date) DO UPDATE SET current_qty = excluded.current_qty;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_expiry_alert_update
+AFTER UPDATE OF current_qty ON expiry_management
+BEGIN
+    DELETE FROM stock_alerts
+    WHERE NEW.current_qty <= 0
+      AND kind = 'expiry'
+      AND barcode = NEW.barcode
+      AND batch_no = NEW.batch_no
+      AND expiry_date = NEW.expiry_date;
+    INSERT INTO stock_alerts (kind, barcode, batch_no, expiry_date, current_qty)
+    SELECT 'expiry', NEW.barcode, NEW.batch_no, NEW.expiry_date, NEW.current_qty WHERE NEW.current_qty > 0
+    ON CONFLICT(kind, barcode, batch_no, expiry_date) DO UPDATE SET current_qty = excluded.current_qty;
+END;
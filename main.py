@@ -1,7 +1,10 @@
+import logging
 import sys
 
 
 def main() -> int:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
     from PyQt6.QtWidgets import QApplication
     from src.gui.main_window import MainWindow
 
@@ -0,0 +1,289 @@
+"""
+Opt-in timing of InventoryDB work: a latency histogram per InventoryDB method,
+time and row totals per SQL statement, and a rotating slow-query log.
+
+Every connection InventoryDB opens is an InstrumentedConnection. While
+instrumentation is disabled (the default) its execute() only checks one flag
+before handing over to sqlite3; enabled, statements run on a _TimedCursor that
+also times the fetches, so a statement's cost includes reading its rows.
+"""
+from __future__ import annotations
+
+import bisect
+import logging
+import sqlite3
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Any
+
+from config import (
+    SLOW_QUERY_LOG_BACKUPS,
+    SLOW_QUERY_LOG_MAX_BYTES,
+    SLOW_QUERY_LOG_PATH,
+    SLOW_QUERY_THRESHOLD_MS,
+)
+
+# Upper bounds (ms) of the histogram buckets; one more bucket catches the rest.
+HISTOGRAM_BOUNDS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# Distinct statements tracked; later ones are folded into one "(other)" entry.
+MAX_TRACKED_STATEMENTS = 500
+
+slow_query_logger = logging.getLogger(f"{__name__}.slow")
+slow_query_logger.propagate = False
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram; percentiles resolve to a bucket's upper bound."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms: float) -> None:
+        self.buckets[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for i, bucket in enumerate(self.buckets):
+            seen += bucket
+            if seen >= rank and bucket:
+                return min(HISTOGRAM_BOUNDS_MS[i], self.max_ms) if i < len(HISTOGRAM_BOUNDS_MS) else self.max_ms
+        return self.max_ms
+
+    def snapshot(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "mean_ms": self.total_ms / self.count if self.count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": self.max_ms,
+        }
+
+
+class QueryInstrumentation:
+    """Collects timings from InstrumentedConnections and InventoryDB._read/_transaction."""
+
+    def __init__(self, slow_threshold_ms: float = SLOW_QUERY_THRESHOLD_MS, log_path: Path = SLOW_QUERY_LOG_PATH):
+        self.enabled = False
+        self.slow_threshold_ms = float(slow_threshold_ms)
+        self.log_path = Path(log_path)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._methods: dict[str, LatencyHistogram] = {}
+        # normalized sql -> [calls, total_ms, max_ms, rows]
+        self._statements: dict[str, list[float]] = {}
+        self._normalized: dict[str, str] = {}
+        self._log_handler: RotatingFileHandler | None = None
+
+    def connect(self, database: Any, **kwargs: Any) -> InstrumentedConnection:
+        conn = sqlite3.connect(database, factory=InstrumentedConnection, **kwargs)
+        conn.instrumentation = self
+        return conn
+
+    def enable(self, slow_threshold_ms: float | None = None) -> None:
+        if slow_threshold_ms is not None:
+            self.slow_threshold_ms = float(slow_threshold_ms)
+        if self._log_handler is None:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            self._log_handler = RotatingFileHandler(
+                self.log_path,
+                maxBytes=SLOW_QUERY_LOG_MAX_BYTES,
+                backupCount=SLOW_QUERY_LOG_BACKUPS,
+                encoding="utf-8",
+            )
+            self._log_handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            slow_query_logger.addHandler(self._log_handler)
+            slow_query_logger.setLevel(logging.INFO)
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+        if self._log_handler is not None:
+            slow_query_logger.removeHandler(self._log_handler)
+            self._log_handler.close()
+            self._log_handler = None
+
+    def reset(self) -> None:
+        with self._lock:
+            self._methods.clear()
+            self._statements.clear()
+
+    def begin_method(self, name: str) -> float:
+        stack = getattr(self._local, "methods", None)
+        if stack is None:
+            stack = self._local.methods = []
+        stack.append(name)
+        return time.perf_counter()
+
+    def end_method(self, started: float) -> None:
+        elapsed_ms = (time.perf_counter() - started) * 1e3
+        name = self._local.methods.pop()
+        with self._lock:
+            histogram = self._methods.get(name)
+            if histogram is None:
+                histogram = self._methods[name] = LatencyHistogram()
+            histogram.add(elapsed_ms)
+
+    def current_method(self) -> str:
+        stack = getattr(self._local, "methods", None)
+        return stack[-1] if stack else ""
+
+    def record_statement(self, sql: str, elapsed_ms: float, rows: int, new_call: bool, call_ms: float) -> None:
+        """Add one execute or fetch of sql; call_ms is the whole call's time so far."""
+        with self._lock:
+            key = self._normalized.get(sql)
+            if key is None:
+                key = " ".join(sql.split())
+                if len(self._normalized) < MAX_TRACKED_STATEMENTS:
+                    self._normalized[sql] = key
+            stats = self._statements.get(key)
+            if stats is None:
+                if len(self._statements) >= MAX_TRACKED_STATEMENTS:
+                    key = "(other)"
+                    stats = self._statements.get(key)
+                if stats is None:
+                    stats = self._statements[key] = [0, 0.0, 0.0, 0]
+            if new_call:
+                stats[0] += 1
+            stats[1] += elapsed_ms
+            stats[2] = max(stats[2], call_ms)
+            stats[3] += rows
+
+    def log_slow(self, sql: str, call_ms: float, rows: int) -> None:
+        slow_query_logger.info(
+            "%.1f ms rows=%d method=%s sql=%s", call_ms, rows, self.current_method() or "-", " ".join(sql.split())
+        )
+
+    def snapshot(self) -> dict[str, Any]:
+        """Method histograms and per-statement totals, largest total time first."""
+        with self._lock:
+            methods = {name: histogram.snapshot() for name, histogram in self._methods.items()}
+            statements = [
+                {"sql": sql, "calls": int(calls), "total_ms": total, "max_ms": worst, "rows": int(rows)}
+                for sql, (calls, total, worst, rows) in self._statements.items()
+            ]
+        statements.sort(key=lambda row: row["total_ms"], reverse=True)
+        by_total = sorted(methods.items(), key=lambda item: item[1]["count"] * item[1]["mean_ms"], reverse=True)
+        return {
+            "enabled": self.enabled,
+            "slow_threshold_ms": self.slow_threshold_ms,
+            "methods": dict(by_total),
+            "statements": statements,
+        }
+
+
+class _TimedCursor(sqlite3.Cursor):
+    """
+    Times execute and every fetch of one statement. A slow query is logged once
+    its rows are exhausted (or the cursor is dropped), so the log has the full
+    time and row count; statements without a result set are logged right away.
+    """
+
+    instrumentation: QueryInstrumentation
+    _sql = ""
+    _call_ms = 0.0
+    _rows = 0
+    _pending_slow = False
+
+    def _track(self, sql: str) -> None:
+        self._flush_slow()
+        self._sql = sql
+        self._call_ms = 0.0
+        self._rows = 0
+
+    def _add(self, started: float, rows: int, new_call: bool = False, done: bool = False) -> None:
+        elapsed_ms = (time.perf_counter() - started) * 1e3
+        self._call_ms += elapsed_ms
+        self._rows += rows
+        inst = self.instrumentation
+        inst.record_statement(self._sql, elapsed_ms, rows, new_call, self._call_ms)
+        if self._call_ms >= inst.slow_threshold_ms:
+            self._pending_slow = True
+        if done or self.description is None:
+            self._flush_slow()
+
+    def _flush_slow(self) -> None:
+        if self._pending_slow:
+            self._pending_slow = False
+            self.instrumentation.log_slow(self._sql, self._call_ms, self._rows)
+
+    def __del__(self) -> None:
+        self._flush_slow()
+
+    def execute(self, sql: str, parameters: Any = (), /) -> _TimedCursor:
+        self._track(sql)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._add(started, max(self.rowcount, 0), new_call=True)
+
+    def executemany(self, sql: str, seq_of_parameters: Any, /) -> _TimedCursor:
+        self._track(sql)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._add(started, max(self.rowcount, 0), new_call=True)
+
+    def fetchone(self) -> Any:
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._add(started, int(row is not None), done=row is None)
+        return row
+
+    def fetchmany(self, size: int | None = None) -> list[Any]:
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._add(started, len(rows), done=len(rows) < size)
+        return rows
+
+    def fetchall(self) -> list[Any]:
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._add(started, len(rows), done=True)
+        return rows
+
+    def __next__(self) -> Any:
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._add(started, 0, done=True)
+            raise
+        self._add(started, 1)
+        return row
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    instrumentation: QueryInstrumentation | None = None
+
+    def _timed_cursor(self) -> _TimedCursor:
+        cursor = self.cursor(_TimedCursor)
+        cursor.instrumentation = self.instrumentation
+        return cursor
+
+    def execute(self, sql: str, parameters: Any = (), /) -> sqlite3.Cursor:
+        inst = self.instrumentation
+        if inst is None or not inst.enabled:
+            return super().execute(sql, parameters)
+        return self._timed_cursor().execute(sql, parameters)
+
+    def executemany(self, sql: str, seq_of_parameters: Any, /) -> sqlite3.Cursor:
+        inst = self.instrumentation
+        if inst is None or not inst.enabled:
+            return super().executemany(sql, seq_of_parameters)
+        return self._timed_cursor().executemany(sql, seq_of_parameters)
@@ -1,16 +1,60 @@
 from __future__ import annotations
 
+import bisect
+import heapq
+import json
+import logging
+import os
+import queue
+import stat
 import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
 from contextlib import contextmanager
-from dataclasses import dataclass
-from datetime import date
+from dataclasses import dataclass, field, replace
+from datetime import date, timedelta
 from pathlib import Path
-from typing import Any, Iterable
-
-from config import DB_DIR, DB_PATH, SCHEMA_PATH
+from typing import Any, Callable, Iterable, Iterator, Mapping
+
+from config import (
+    DB_DIR,
+    DB_PATH,
+    DB_PERFORMANCE_PROFILE,
+    DB_PERFORMANCE_PROFILES,
+    ARCHIVE_CHUNK_SIZE,
+    COMPLETION_LIMIT,
+    DB_READER_ACQUIRE_TIMEOUT_S,
+    DB_READER_POOL_SIZE,
+    PRODUCT_CACHE_MAX_ENTRIES,
+    SCHEMA_PATH,
+    SEARCH_LIMIT,
+)
+from src.db_instrumentation import QueryInstrumentation
+from src.pinyin import initials as pinyin_initials
 
 DB_SELECTION_FILE = DB_DIR / ".selected_db_path"
 
+logger = logging.getLogger(__name__)
+
+# PRAGMA user_version of a fully migrated main database (see InventoryDB._MIGRATIONS).
+SCHEMA_VERSION = 9
+
+# journal_mode is persistent for the database file, so it is only issued on
+# the writer connection; everything else is per-connection state.
+_PER_CONNECTION_PRAGMAS = ("synchronous", "cache_size", "mmap_size", "temp_store", "busy_timeout")
+# PRAGMA user_version stamped on an archive file once its month is sealed.
+ARCHIVE_SEALED_VERSION = 1
+
+# daily_rollups row holding the whole-day totals rather than a single product.
+DAY_TOTAL_BARCODE = ""
+
+_PRAGMA_NAMED_VALUES = {
+    "synchronous": {"OFF": 0, "NORMAL": 1, "FULL": 2, "EXTRA": 3},
+    "temp_store": {"DEFAULT": 0, "FILE": 1, "MEMORY": 2},
+}
+
 
 @dataclass
 class Product:
@@ -28,6 +72,207 @@ class CartItem:
     quantity: int
 
 
+@dataclass
+class StockInLine:
+    barcode: str
+    quantity: int
+    batch_no: str | None = None
+    expiry_date: str | None = None
+
+
+@dataclass
+class ChangeSet:
+    """What a committed write touched; published to InventoryDB subscribers."""
+
+    barcodes: set[str] = field(default_factory=set)
+    catalog_barcodes: set[str] = field(default_factory=set)
+    customer_order_ids: set[int] = field(default_factory=set)
+    days: set[str] = field(default_factory=set)
+    everything: bool = False
+
+    def merge(self, other: ChangeSet) -> None:
+        self.barcodes |= other.barcodes
+        self.catalog_barcodes |= other.catalog_barcodes
+        self.customer_order_ids |= other.customer_order_ids
+        self.days |= other.days
+        self.everything = self.everything or other.everything
+
+    def is_empty(self) -> bool:
+        return not (
+            self.barcodes or self.catalog_barcodes or self.customer_order_ids or self.days or self.everything
+        )
+
+
+class ProductCache:
+    """
+    Barcode -> products row cache with an LRU memory bound.
+
+    When the whole catalog fits under max_entries it is loaded in one pass and
+    marked complete, so misses can be answered without touching the database.
+    Larger catalogs fall back to per-barcode lookups with LRU eviction.
+    """
+
+    def __init__(self, max_entries: int = PRODUCT_CACHE_MAX_ENTRIES):
+        self.max_entries = max(1, int(max_entries))
+        self.hits = 0
+        self.misses = 0
+        self.complete = False
+        self._rows: OrderedDict[str, sqlite3.Row] = OrderedDict()
+        self._sorted_barcodes: list[str] | None = None
+        self._lock = threading.Lock()
+
+    def load(self, rows: list[sqlite3.Row], total: int) -> None:
+        with self._lock:
+            self._rows = OrderedDict((str(row["barcode"]), row) for row in rows[: self.max_entries])
+            self.complete = total <= self.max_entries
+            self._sorted_barcodes = sorted(self._rows) if self.complete else None
+
+    def get(self, barcode: str) -> tuple[bool, sqlite3.Row | None]:
+        """Return (found_in_cache, row). A complete cache also answers negative lookups."""
+        with self._lock:
+            row = self._rows.get(barcode)
+            if row is not None:
+                self._rows.move_to_end(barcode)
+                self.hits += 1
+                return True, row
+            if self.complete:
+                self.hits += 1
+                return True, None
+            self.misses += 1
+            return False, None
+
+    def put(self, row: sqlite3.Row) -> None:
+        barcode = str(row["barcode"])
+        with self._lock:
+            is_new = barcode not in self._rows
+            self._rows[barcode] = row
+            self._rows.move_to_end(barcode)
+            if is_new and self._sorted_barcodes is not None:
+                bisect.insort(self._sorted_barcodes, barcode)
+            while len(self._rows) > self.max_entries:
+                self._rows.popitem(last=False)
+                # An evicted entry means the cache no longer mirrors the table.
+                self.complete = False
+                self._sorted_barcodes = None
+
+    def barcodes(self) -> list[str] | None:
+        with self._lock:
+            return list(self._sorted_barcodes) if self._sorted_barcodes is not None else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rows.clear()
+            self.complete = False
+            self._sorted_barcodes = None
+
+    def stats(self) -> dict[str, int | bool]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._rows),
+                "max_entries": self.max_entries,
+                "complete": self.complete,
+            }
+
+
+class ProductPrefixIndex:
+    """
+    Sorted (key, barcode) pairs over each product's barcode and lowercased
+    name. A prefix lookup is a bisect plus a walk over at most `limit` matches;
+    upserts insert or move a single product's keys.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._keys: list[tuple[str, str]] = []
+        self._names: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def load(self, rows: Iterable[tuple[str, str]]) -> None:
+        names = {str(barcode): str(name) for barcode, name in rows}
+        keys = [(barcode.lower(), barcode) for barcode in names]
+        keys.extend((name.lower(), barcode) for barcode, name in names.items() if name)
+        keys.sort()
+        with self._lock:
+            self._names = names
+            self._keys = keys
+            self.loaded = True
+
+    def put(self, barcode: str, name: str) -> None:
+        with self._lock:
+            old_name = self._names.get(barcode)
+            if old_name is None:
+                bisect.insort(self._keys, (barcode.lower(), barcode))
+            elif old_name != name and old_name:
+                pos = bisect.bisect_left(self._keys, (old_name.lower(), barcode))
+                if pos < len(self._keys) and self._keys[pos] == (old_name.lower(), barcode):
+                    del self._keys[pos]
+            if name and old_name != name:
+                bisect.insort(self._keys, (name.lower(), barcode))
+            self._names[barcode] = name
+
+    def search(self, prefix: str, limit: int = COMPLETION_LIMIT) -> list[tuple[str, str]]:
+        """Up to limit (barcode, name) pairs whose barcode or name starts with prefix."""
+        prefix = prefix.strip().lower()
+        if not prefix or limit <= 0:
+            return []
+        results: list[tuple[str, str]] = []
+        seen: set[str] = set()
+        with self._lock:
+            pos = bisect.bisect_left(self._keys, (prefix, ""))
+            while pos < len(self._keys) and len(results) < limit:
+                key, barcode = self._keys[pos]
+                if not key.startswith(prefix):
+                    break
+                if barcode not in seen:
+                    seen.add(barcode)
+                    results.append((barcode, self._names[barcode]))
+                pos += 1
+        return results
+
+    def clear(self) -> None:
+        with self._lock:
+            self._keys = []
+            self._names = {}
+            self.loaded = False
+
+
+def _search_tokens(text: str) -> str:
+    """One FTS token per character, so a phrase query matches any substring."""
+    return " ".join(ch for ch in str(text or "").lower() if not ch.isspace())
+
+
+def _search_match_expression(query: str) -> str | None:
+    phrase = _search_tokens(query)
+    if not phrase:
+        return None
+    return '"%s"' % phrase.replace('"', '""')
+
+
+def _day_range(day: str) -> tuple[str, str]:
+    """Half-open [start, end) timestamp bounds for a YYYY-MM-DD day, usable by an index."""
+    start = date.fromisoformat(day)
+    return start.isoformat(), (start + timedelta(days=1)).isoformat()
+
+
+def _month_range(month_key: str) -> tuple[str, str]:
+    """Half-open [start, end) timestamp bounds for a YYYY-MM month."""
+    year, month = (int(part) for part in month_key.split("-"))
+    end_year, end_month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return f"{year:04d}-{month:02d}-01", f"{end_year:04d}-{end_month:02d}-01"
+
+
+def _month_keys(start_date: date, end_date: date) -> list[str]:
+    """YYYY-MM keys of every month touched by the inclusive date range."""
+    keys = []
+    year, month = start_date.year, start_date.month
+    while (year, month) <= (end_date.year, end_date.month):
+        keys.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return keys
+
+
 def load_selected_db_path(default_path: Path = DB_PATH) -> Path:
     if DB_SELECTION_FILE.exists():
         raw = DB_SELECTION_FILE.read_text(encoding="utf-8").strip()
@@ -42,110 +287,324 @@ def save_selected_db_path(path: Path) -> None:
 
 
 class InventoryDB:
-    def __init__(self, db_path: Path = DB_PATH, schema_path: Path = SCHEMA_PATH):
+    def __init__(
+        self,
+        db_path: Path = DB_PATH,
+        schema_path: Path = SCHEMA_PATH,
+        reader_pool_size: int = DB_READER_POOL_SIZE,
+        profile: str = DB_PERFORMANCE_PROFILE,
+        product_cache_size: int = PRODUCT_CACHE_MAX_ENTRIES,
+        instrumentation: QueryInstrumentation | None = None,
+    ):
+        if profile not in DB_PERFORMANCE_PROFILES:
+            raise ValueError(f"unknown performance profile: {profile}")
         self.db_path = Path(db_path)
         self.schema_path = schema_path
+        self.profile = profile
+        self.pragmas = dict(DB_PERFORMANCE_PROFILES[profile])
         self.archive_dir = self.db_path.parent / "archives"
+        # Shared with the caller so timings can outlive a database switch.
+        self.instrumentation = instrumentation or QueryInstrumentation()
 
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         self.archive_dir.mkdir(parents=True, exist_ok=True)
         DB_DIR.mkdir(parents=True, exist_ok=True)
 
-        self._init_db()
-        self._ensure_sales_schema()
-        self._ensure_stock_totals_backfilled()
-        self._archive_closed_month_logs()
+        # One long-lived writer (serialized by a lock) plus a small pool of
+        # reader connections, shared safely across threads.
+        self._write_lock = threading.RLock()
+        self._writer = self._connect()
+        journal_mode = self.pragmas.get("journal_mode")
+        if journal_mode:
+            self._writer.execute(f"PRAGMA journal_mode = {journal_mode}")
+        self._readers: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue()
+        self._all_readers: list[sqlite3.Connection] = []
+        self._reader_pool_size = max(1, int(reader_pool_size))
+        self._readers_lock = threading.Lock()
+        self._closed = False
+        self.product_cache = ProductCache(product_cache_size)
+        self._product_cache_loaded = False
+        self.product_index = ProductPrefixIndex()
+        self._sealed_archives: set[Path] = set()
+        self._subscribers: list[Callable[[ChangeSet], None]] = []
+        self._archive_thread: threading.Thread | None = None
+        self._archive_stop = threading.Event()
+        # Held while a chunk is copied to its archive and deleted from stock_logs
+        # (and while an archive is sealed), so work that must see every log row
+        # exactly once across main and archives can keep the archiver out.
+        self._archive_lock = threading.RLock()
+
+        self._upgrade_archive_schemas()
+        self._migrate()
 
     def _connect(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
+        conn = self.instrumentation.connect(self.db_path, check_same_thread=False)
         conn.row_factory = sqlite3.Row
         conn.execute("PRAGMA foreign_keys = ON")
+        for name in _PER_CONNECTION_PRAGMAS:
+            if name in self.pragmas:
+                conn.execute(f"PRAGMA {name} = {self.pragmas[name]}")
         return conn
 
+    def get_active_pragmas(self) -> dict[str, Any]:
+        """Read back the PRAGMA values currently in effect on a pooled reader."""
+        names = ("journal_mode", "foreign_keys", *_PER_CONNECTION_PRAGMAS)
+        with self._read() as conn:
+            return {name: conn.execute(f"PRAGMA {name}").fetchone()[0] for name in names}
+
+    def verify_pragmas(self) -> dict[str, tuple[Any, Any]]:
+        """
+        Compare the active settings against the configured profile.
+        Returns {pragma: (expected, actual)} for every mismatch; empty means OK.
+        """
+        active = self.get_active_pragmas()
+        mismatches: dict[str, tuple[Any, Any]] = {}
+        for name, expected in self.pragmas.items():
+            actual = active.get(name)
+            if isinstance(expected, str):
+                named = _PRAGMA_NAMED_VALUES.get(name)
+                if named is not None:
+                    matched = actual == named.get(expected.upper())
+                else:
+                    matched = str(actual).lower() == expected.lower()
+            else:
+                matched = actual == expected
+            if not matched:
+                mismatches[name] = (expected, actual)
+        return mismatches
+
+    def close(self) -> None:
+        self._archive_stop.set()
+        if self._archive_thread is not None and self._archive_thread is not threading.current_thread():
+            self._archive_thread.join()
+        with self._write_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._writer.close()
+        with self._readers_lock:
+            for conn in self._all_readers:
+                conn.close()
+            self._all_readers.clear()
+
+    def __enter__(self) -> InventoryDB:
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self.close()
+
+    def subscribe(self, callback: Callable[[ChangeSet], None]) -> Callable[[], None]:
+        """
+        Call callback(change) after every committed write. Callbacks run on the
+        writing thread; GUI code must hop to its own thread. Returns an unsubscribe.
+        """
+        self._subscribers.append(callback)
+
+        def unsubscribe() -> None:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+        return unsubscribe
+
+    def _publish(self, change: ChangeSet) -> None:
+        if change.is_empty():
+            return
+        for callback in list(self._subscribers):
+            try:
+                callback(change)
+            except Exception:
+                logger.exception("change subscriber failed")
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._readers_lock:
+            if len(self._all_readers) < self._reader_pool_size:
+                conn = self._connect()
+                self._all_readers.append(conn)
+                return conn
+        try:
+            return self._readers.get(timeout=DB_READER_ACQUIRE_TIMEOUT_S)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"no free database reader within {DB_READER_ACQUIRE_TIMEOUT_S}s "
+                f"(all {self._reader_pool_size} are in use)"
+            ) from None
+
     @contextmanager
-    def _transaction(self):
-        conn = self._connect()
+    def _read(self):
+        """Borrow a pooled read-only connection for the duration of the block."""
+        if self._closed:
+            raise sqlite3.ProgrammingError("database is closed")
+        inst = self.instrumentation
+        # Frame 2 is the InventoryDB method that entered this block.
+        started = inst.begin_method(sys._getframe(2).f_code.co_name) if inst.enabled else None
+        conn = self._acquire_reader()
         try:
             yield conn
-            conn.commit()
-        except Exception:
-            conn.rollback()
-            raise
         finally:
-            conn.close()
+            if conn.in_transaction:
+                conn.rollback()
+            self._readers.put(conn)
+            if started is not None:
+                inst.end_method(started)
 
-    def _init_db(self) -> None:
+    @contextmanager
+    def _transaction(self):
+        with self._write_lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("database is closed")
+            conn = self._writer
+            inst = self.instrumentation
+            started = inst.begin_method(sys._getframe(2).f_code.co_name) if inst.enabled else None
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                if started is not None:
+                    inst.end_method(started)
+
+    # (version, description, method) applied in order to bring user_version up to SCHEMA_VERSION.
+    # Every step must be idempotent so databases created before versioning can run all of them.
+    _MIGRATIONS: tuple[tuple[int, str, str], ...] = (
+        (1, "base schema", "_migrate_base_schema"),
+        (2, "backfill stock_totals", "_ensure_stock_totals_backfilled"),
+        (3, "backfill daily_rollups", "_ensure_daily_rollups_backfilled"),
+        (4, "build product search index", "_ensure_product_search_backfilled"),
+        (5, "stock_totals triggers", "_ensure_stock_flags_backfilled"),
+        (6, "stock_alerts", "_ensure_stock_alerts_backfilled"),
+        (7, "reindex product search", "_ensure_product_search_backfilled"),
+        (8, "stock_alerts sort indexes", "_ensure_stock_alert_indexes"),
+        (9, "daily_rollups day-total index", "_migrate_base_schema"),
+    )
+
+    def _schema_version(self) -> int:
+        with self._write_lock:
+            return int(self._writer.execute("PRAGMA user_version").fetchone()[0])
+
+    def _set_schema_version(self, version: int) -> None:
         with self._transaction() as conn:
-            schema_sql = self.schema_path.read_text(encoding="utf-8")
-            conn.executescript(schema_sql)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+
+    def _migrate(self) -> None:
+        version = self._schema_version()
+        if version == SCHEMA_VERSION:
+            return
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(
+                f"数据库版本 {version} 高于程序支持的版本 {SCHEMA_VERSION}，请升级程序"
+            )
 
-    def _ensure_sales_schema(self) -> None:
-        with self._transaction() as conn:
-            columns = {
-                str(row["name"])
-                for row in conn.execute("PRAGMA table_info(stock_logs)").fetchall()
-            }
-            if "sale_order_id" not in columns:
-                conn.execute("ALTER TABLE stock_logs ADD COLUMN sale_order_id INTEGER")
+        started = time.perf_counter()
+        with self._write_lock:
+            is_new = (
+                self._writer.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products'"
+                ).fetchone()
+                is None
+            )
+        if is_new:
+            # A brand-new file only needs the current schema; there is nothing to backfill.
+            self._migrate_base_schema()
+            self._set_schema_version(SCHEMA_VERSION)
+            logger.info("created schema v%d in %.1f ms", SCHEMA_VERSION, (time.perf_counter() - started) * 1e3)
+            return
+
+        for target, description, method in self._MIGRATIONS:
+            if target <= version:
+                continue
+            step_started = time.perf_counter()
+            getattr(self, method)()
+            self._set_schema_version(target)
+            logger.info(
+                "migrated %s to v%d (%s) in %.1f ms",
+                self.db_path.name,
+                target,
+                description,
+                (time.perf_counter() - step_started) * 1e3,
+            )
+        logger.info(
+            "schema migration v%d -> v%d finished in %.1f ms",
+            version,
+            SCHEMA_VERSION,
+            (time.perf_counter() - started) * 1e3,
+        )
 
+    def _migrate_base_schema(self) -> None:
+        with self._transaction() as conn:
+            self._apply_schema_sql(conn)
+
+    # Columns added to existing tables after their first release: (table, column, definition).
+    _ADDED_COLUMNS = (
+        ("stock_logs", "sale_order_id", "INTEGER"),
+        ("stock_totals", "is_low", "INTEGER NOT NULL DEFAULT 0"),
+    )
+
+    def _apply_schema_sql(self, conn: sqlite3.Connection) -> None:
+        # Old tables first get the columns schema.sql's indexes and triggers refer to.
+        for table, column, definition in self._ADDED_COLUMNS:
+            columns = {str(row["name"]) for row in conn.execute(f"PRAGMA table_info({table})").fetchall()}
+            if columns and column not in columns:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        # schema.sql only uses IF NOT EXISTS, so later migrations can re-run it to add their tables.
+        conn.executescript(self.schema_path.read_text(encoding="utf-8"))
+
+    def _ensure_stock_flags_backfilled(self) -> None:
+        with self._transaction() as conn:
+            self._apply_schema_sql(conn)
             conn.execute(
                 """
-                CREATE TABLE IF NOT EXISTS sales_orders (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    total_due REAL NOT NULL,
-                    total_received REAL NOT NULL,
-                    discount REAL NOT NULL DEFAULT 0,
-                    timestamp DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
-                )
+                INSERT OR IGNORE INTO stock_totals(barcode, current_qty)
+                SELECT barcode, 0 FROM products
                 """
             )
             conn.execute(
                 """
-                CREATE TABLE IF NOT EXISTS sales_order_items (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    order_id INTEGER NOT NULL,
-                    barcode TEXT NOT NULL,
-                    quantity INTEGER NOT NULL,
-                    unit_retail_price REAL NOT NULL,
-                    unit_purchase_price REAL NOT NULL,
-                    FOREIGN KEY (order_id) REFERENCES sales_orders (id) ON DELETE CASCADE
+                UPDATE stock_totals
+                SET is_low = current_qty < COALESCE(
+                    (SELECT min_stock FROM products p WHERE p.barcode = stock_totals.barcode), 0
                 )
                 """
             )
-            conn.execute(
-                "CREATE INDEX IF NOT EXISTS idx_sales_orders_timestamp ON sales_orders(timestamp)"
-            )
+
+    def _ensure_product_search_backfilled(self) -> None:
+        with self._transaction() as conn:
+            self._apply_schema_sql(conn)
+            products = conn.execute("SELECT barcode, name, category FROM products").fetchall()
+            self._index_product_search(conn, products)
+
+    def _ensure_stock_alerts_backfilled(self) -> None:
+        with self._transaction() as conn:
+            self._apply_schema_sql(conn)
+            # Superseded by stock_alerts.
+            conn.execute("DROP INDEX IF EXISTS idx_stock_totals_low")
+            conn.execute("DELETE FROM stock_alerts")
             conn.execute(
                 """
-                CREATE TABLE IF NOT EXISTS customer_orders (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    sale_order_id INTEGER UNIQUE,
-                    customer TEXT,
-                    total_due REAL NOT NULL,
-                    total_received REAL,
-                    created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                    updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (sale_order_id) REFERENCES sales_orders (id) ON DELETE SET NULL
-                )
+                INSERT INTO stock_alerts (kind, barcode, current_qty)
+                SELECT 'low_stock', barcode, current_qty FROM stock_totals WHERE is_low = 1
                 """
             )
             conn.execute(
                 """
-                CREATE TABLE IF NOT EXISTS customer_order_items (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    customer_order_id INTEGER NOT NULL,
-                    barcode TEXT NOT NULL,
-                    name TEXT NOT NULL,
-                    quantity INTEGER NOT NULL,
-                    unit_retail_price REAL NOT NULL,
-                    line_due REAL NOT NULL,
-                    FOREIGN KEY (customer_order_id) REFERENCES customer_orders (id) ON DELETE CASCADE
-                )
+                INSERT INTO stock_alerts (kind, barcode, batch_no, expiry_date, current_qty)
+                SELECT 'expiry', barcode, batch_no, expiry_date, current_qty
+                FROM expiry_management
+                WHERE current_qty > 0
                 """
             )
-            conn.execute(
-                "CREATE INDEX IF NOT EXISTS idx_customer_orders_created_at ON customer_orders(created_at)"
-            )
+
+    def _ensure_stock_alert_indexes(self) -> None:
+        with self._transaction() as conn:
+            # Partial indexes the warning reads never used; replaced by (kind, ...) ones.
+            conn.execute("DROP INDEX IF EXISTS idx_stock_alerts_low_stock")
+            conn.execute("DROP INDEX IF EXISTS idx_stock_alerts_expiry")
+            self._apply_schema_sql(conn)
 
     def _ensure_stock_totals_backfilled(self) -> None:
         with self._transaction() as conn:
@@ -154,6 +613,7 @@ class InventoryDB:
                 CREATE TABLE IF NOT EXISTS stock_totals (
                     barcode TEXT PRIMARY KEY,
                     current_qty INTEGER NOT NULL DEFAULT 0,
+                    is_low INTEGER NOT NULL DEFAULT 0,
                     FOREIGN KEY (barcode) REFERENCES products (barcode)
                 )
                 """
@@ -213,48 +673,198 @@ class InventoryDB:
             archive_conn.execute(
                 "ALTER TABLE archived_stock_logs ADD COLUMN sale_order_id INTEGER"
             )
+        archive_conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_archived_stock_logs_timestamp ON archived_stock_logs(timestamp)"
+        )
+        archive_conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_archived_stock_logs_barcode "
+            "ON archived_stock_logs(barcode, timestamp)"
+        )
+
+    def _open_archive(self, archive_path: Path) -> sqlite3.Connection:
+        """Open an archive for writing, unsealing it first if a late row has to be added."""
+        if self._is_archive_sealed(archive_path):
+            self._unseal_archive(archive_path)
+        archive_conn = self.instrumentation.connect(archive_path)
+        archive_conn.row_factory = sqlite3.Row
+        self._ensure_archive_schema(archive_conn)
+        return archive_conn
+
+    def _open_archive_for_read(self, archive_path: Path) -> sqlite3.Connection:
+        """
+        Archives are always opened read-only here: no schema check and never
+        unsealed, which is left to the archiver. Sealed ones are also immutable
+        (no locking); unsealed ones were brought up to date at startup.
+        """
+        mode = "ro&immutable=1" if self._is_archive_sealed(archive_path) else "ro"
+        archive_conn = self.instrumentation.connect(f"{archive_path.resolve().as_uri()}?mode={mode}", uri=True)
+        archive_conn.row_factory = sqlite3.Row
+        return archive_conn
+
+    def _upgrade_archive_schemas(self) -> None:
+        # Runs before the archiver thread exists. Sealed archives already went
+        # through _ensure_archive_schema when they were sealed.
+        for archive_path in sorted(self.archive_dir.glob("stock_logs_*.db")):
+            if self._is_archive_sealed(archive_path):
+                continue
+            archive_conn = self._open_archive(archive_path)
+            try:
+                archive_conn.commit()
+            finally:
+                archive_conn.close()
+
+    def _is_archive_sealed(self, archive_path: Path) -> bool:
+        if archive_path in self._sealed_archives:
+            return True
+        if not archive_path.exists() or os.stat(archive_path).st_mode & stat.S_IWUSR:
+            return False
+        archive_conn = sqlite3.connect(f"{archive_path.resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            sealed = archive_conn.execute("PRAGMA user_version").fetchone()[0] == ARCHIVE_SEALED_VERSION
+        finally:
+            archive_conn.close()
+        if sealed:
+            self._sealed_archives.add(archive_path)
+        return sealed
+
+    def seal_archive(self, month_key: str) -> bool:
+        """
+        Finalize a closed month's archive: ensure indexes, ANALYZE, VACUUM, stamp
+        user_version and make the file read-only. Returns False if nothing to seal.
+        """
+        archive_path = self._archive_db_path(month_key)
+        if not archive_path.exists() or self._is_archive_sealed(archive_path):
+            return False
+
+        with self._archive_lock:
+            archive_conn = self._open_archive(archive_path)
+            try:
+                archive_conn.execute("ANALYZE")
+                archive_conn.execute(f"PRAGMA user_version = {ARCHIVE_SEALED_VERSION}")
+                archive_conn.commit()
+                archive_conn.execute("VACUUM")
+            finally:
+                archive_conn.close()
+            os.chmod(archive_path, stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH)
+            self._sealed_archives.add(archive_path)
+        return True
+
+    def _unseal_archive(self, archive_path: Path) -> None:
+        os.chmod(archive_path, stat.S_IREAD | stat.S_IWRITE | stat.S_IRGRP | stat.S_IROTH)
+        archive_conn = sqlite3.connect(archive_path)
+        try:
+            archive_conn.execute("PRAGMA user_version = 0")
+            archive_conn.commit()
+        finally:
+            archive_conn.close()
+        self._sealed_archives.discard(archive_path)
+
+    def start_background_archiving(self, chunk_size: int = ARCHIVE_CHUNK_SIZE) -> threading.Thread:
+        """Archive closed months on a daemon thread; close() stops it between chunks."""
+        if self._archive_thread is not None and self._archive_thread.is_alive():
+            return self._archive_thread
+        self._archive_stop.clear()
+        self._archive_thread = threading.Thread(
+            target=self.archive_closed_month_logs,
+            kwargs={"chunk_size": chunk_size},
+            name="snackstock-archiver",
+            daemon=True,
+        )
+        self._archive_thread.start()
+        return self._archive_thread
+
+    def archive_closed_month_logs(self, chunk_size: int = ARCHIVE_CHUNK_SIZE) -> int:
+        """
+        Move stock_logs of months before the current one into monthly archive files.
+
+        Rows are copied in chunks of chunk_size: each chunk is committed to the archive
+        first and only then deleted from the main DB in a short write transaction that
+        also advances archive_progress. A crash between the two steps just re-copies
+        that chunk on the next run (INSERT OR IGNORE on source_id), so the job is
+        resumable and never holds the main write lock for more than one chunk.
+        Months with nothing left in stock_logs are then sealed (see seal_archive).
+        Returns the number of rows archived.
+        """
+        chunk_size = max(1, int(chunk_size))
+        current_month_start, _ = _month_range(date.today().strftime("%Y-%m"))
+        archived = 0
+        for month_key in self._closed_log_months(current_month_start):
+            if self._archive_stop.is_set():
+                break
+            archived += self._archive_month(month_key, chunk_size)
 
-    def _archive_closed_month_logs(self) -> None:
         current_month = date.today().strftime("%Y-%m")
-        with self._transaction() as conn:
-            months = conn.execute(
-                """
-                SELECT DISTINCT SUBSTR(timestamp, 1, 7) AS month_key
-                FROM stock_logs
-                WHERE SUBSTR(timestamp, 1, 7) < ?
-                ORDER BY month_key ASC
-                """,
-                (current_month,),
-            ).fetchall()
+        for archive_path in sorted(self.archive_dir.glob("stock_logs_*.db")):
+            if self._archive_stop.is_set():
+                break
+            month_key = archive_path.stem.removeprefix("stock_logs_").replace("_", "-")
+            if month_key < current_month and not self._has_pending_logs(month_key):
+                self.seal_archive(month_key)
+        return archived
+
+    def _has_pending_logs(self, month_key: str) -> bool:
+        month_start, month_end = _month_range(month_key)
+        with self._read() as conn:
+            return (
+                conn.execute(
+                    "SELECT 1 FROM stock_logs WHERE timestamp >= ? AND timestamp < ? LIMIT 1",
+                    (month_start, month_end),
+                ).fetchone()
+                is not None
+            )
 
-            for row in months:
-                month_key = row["month_key"]
-                monthly_logs = conn.execute(
+    def _closed_log_months(self, before: str) -> list[str]:
+        month_keys: list[str] = []
+        with self._read() as conn:
+            # Walk the timestamp index month by month instead of scanning every row.
+            cursor_ts = ""
+            while True:
+                row = conn.execute(
                     """
-                    SELECT
-                        l.id AS source_id,
-                        l.timestamp,
-                        l.type,
-                        l.barcode,
-                        p.name,
-                        l.change_qty,
-                        p.purchase_price,
-                        p.retail_price,
-                        l.sale_order_id
-                    FROM stock_logs l
-                    JOIN products p ON p.barcode = l.barcode
-                    WHERE SUBSTR(l.timestamp, 1, 7) = ?
-                    ORDER BY l.id ASC
+                    SELECT MIN(timestamp) AS ts
+                    FROM stock_logs
+                    WHERE timestamp >= ? AND timestamp < ?
                     """,
-                    (month_key,),
-                ).fetchall()
-                if not monthly_logs:
-                    continue
+                    (cursor_ts, before),
+                ).fetchone()
+                if row["ts"] is None:
+                    break
+                month_key = str(row["ts"])[:7]
+                month_keys.append(month_key)
+                cursor_ts = _month_range(month_key)[1]
+        return month_keys
+
+    def _archive_month(self, month_key: str, chunk_size: int) -> int:
+        month_start, month_end = _month_range(month_key)
+        archived = 0
+        archive_conn = self._open_archive(self._archive_db_path(month_key))
+        try:
+            while not self._archive_stop.is_set():
+                with self._archive_lock:
+                    with self._read() as conn:
+                        chunk = conn.execute(
+                            """
+                            SELECT
+                                l.id AS source_id,
+                                l.timestamp,
+                                l.type,
+                                l.barcode,
+                                p.name,
+                                l.change_qty,
+                                p.purchase_price,
+                                p.retail_price,
+                                l.sale_order_id
+                            FROM stock_logs l
+                            JOIN products p ON p.barcode = l.barcode
+                            WHERE l.timestamp >= ? AND l.timestamp < ?
+                            ORDER BY l.timestamp ASC, l.id ASC
+                            LIMIT ?
+                            """,
+                            (month_start, month_end, chunk_size),
+                        ).fetchall()
+                    if not chunk:
+                        break
 
-                archive_path = self._archive_db_path(month_key)
-                archive_conn = sqlite3.connect(archive_path)
-                try:
-                    self._ensure_archive_schema(archive_conn)
                     archive_conn.executemany(
                         """
                         INSERT OR IGNORE INTO archived_stock_logs
@@ -273,21 +883,114 @@ class InventoryDB:
                                 float(log["retail_price"]),
                                 int(log["sale_order_id"]) if log["sale_order_id"] is not None else None,
                             )
-                            for log in monthly_logs
+                            for log in chunk
                         ],
                     )
                     archive_conn.commit()
-                finally:
-                    archive_conn.close()
 
-                conn.execute(
-                    "DELETE FROM stock_logs WHERE SUBSTR(timestamp, 1, 7) = ?",
-                    (month_key,),
-                )
+                    source_ids = [int(log["source_id"]) for log in chunk]
+                    with self._transaction() as conn:
+                        conn.execute(
+                            "DELETE FROM stock_logs WHERE id IN (SELECT value FROM json_each(?))",
+                            (json.dumps(source_ids),),
+                        )
+                        conn.execute(
+                            """
+                            INSERT INTO archive_progress (month_key, archived_rows, last_source_id)
+                            VALUES (?, ?, ?)
+                            ON CONFLICT(month_key) DO UPDATE SET
+                                archived_rows = archived_rows + excluded.archived_rows,
+                                last_source_id = excluded.last_source_id,
+                                updated_at = CURRENT_TIMESTAMP
+                            """,
+                            (month_key, len(chunk), source_ids[-1]),
+                        )
+                    archived += len(chunk)
+
+            if not self._archive_stop.is_set():
+                with self._transaction() as conn:
+                    conn.execute(
+                        """
+                        INSERT INTO archive_progress (month_key, completed_at)
+                        VALUES (?, CURRENT_TIMESTAMP)
+                        ON CONFLICT(month_key) DO UPDATE SET
+                            completed_at = CURRENT_TIMESTAMP,
+                            updated_at = CURRENT_TIMESTAMP
+                        """,
+                        (month_key,),
+                    )
+        finally:
+            archive_conn.close()
+        return archived
+
+    def get_archive_progress(self) -> list[sqlite3.Row]:
+        with self._read() as conn:
+            return conn.execute(
+                """
+                SELECT month_key, archived_rows, last_source_id, updated_at, completed_at
+                FROM archive_progress
+                ORDER BY month_key ASC
+                """
+            ).fetchall()
 
     def upsert_product(self, product: Product) -> None:
+        self.upsert_products([product])
+
+    def upsert_products(
+        self,
+        products: Iterable[Product],
+        keep_fields: Iterable[str] = (),
+        keep_fields_by_barcode: Mapping[str, Iterable[str]] | None = None,
+    ) -> dict[str, int]:
+        """
+        Insert or update many products in one transaction and return inserted /
+        updated / unchanged counts. Products identical to the stored row are not
+        written or reindexed. For existing products, keep_fields (e.g. "min_stock")
+        keep their stored values instead of the given ones; keep_fields_by_barcode
+        adds fields to keep for single products.
+        """
+        latest = {product.barcode: product for product in products}
+        keep_fields = tuple(keep_fields)
+        keep_fields_by_barcode = keep_fields_by_barcode or {}
+        counts = {"inserted": 0, "updated": 0, "unchanged": 0}
+        if not latest:
+            return counts
+
         with self._transaction() as conn:
-            conn.execute(
+            existing = {
+                str(row["barcode"]): row
+                for row in conn.execute(
+                    "SELECT * FROM products WHERE barcode IN (SELECT value FROM json_each(?))",
+                    (json.dumps(list(latest)),),
+                ).fetchall()
+            }
+            changed: list[Product] = []
+            for barcode, product in latest.items():
+                row = existing.get(barcode)
+                if row is None:
+                    counts["inserted"] += 1
+                    changed.append(product)
+                    continue
+                kept = (*keep_fields, *keep_fields_by_barcode.get(barcode, ()))
+                if kept:
+                    product = replace(product, **{name: row[name] for name in kept})
+                stored = Product(
+                    barcode,
+                    str(row["name"]),
+                    str(row["category"] or ""),
+                    float(row["purchase_price"]),
+                    float(row["retail_price"]),
+                    int(row["min_stock"]),
+                )
+                if replace(product, category=product.category or "") == stored:
+                    counts["unchanged"] += 1
+                else:
+                    counts["updated"] += 1
+                    changed.append(product)
+            if not changed:
+                return counts
+
+            conn.executemany(
                 """
                 INSERT INTO products (barcode, name, category, purchase_price, retail_price, min_stock)
                 VALUES (?, ?, ?, ?, ?, ?)
@@ -298,39 +1001,147 @@ class InventoryDB:
                     retail_price = excluded.retail_price,
                     min_stock = excluded.min_stock
                 """,
-                (
-                    product.barcode,
-                    product.name,
-                    product.category,
-                    product.purchase_price,
-                    product.retail_price,
-                    product.min_stock,
-                ),
-            )
-            conn.execute(
-                """
-                INSERT OR IGNORE INTO stock_totals(barcode, current_qty)
-                VALUES (?, 0)
-                """,
-                (product.barcode,),
+                [
+                    (
+                        product.barcode,
+                        product.name,
+                        product.category,
+                        product.purchase_price,
+                        product.retail_price,
+                        product.min_stock,
+                    )
+                    for product in changed
+                ],
             )
+            saved = conn.execute(
+                "SELECT * FROM products WHERE barcode IN (SELECT value FROM json_each(?))",
+                (json.dumps([product.barcode for product in changed]),),
+            ).fetchall()
+            self._index_product_search(conn, saved)
+
+        # Write-through only after the commit succeeded.
+        for row in saved:
+            self.product_cache.put(row)
+            if self.product_index.loaded:
+                self.product_index.put(str(row["barcode"]), str(row["name"]))
+        barcodes = {product.barcode for product in changed}
+        self._publish(ChangeSet(barcodes=barcodes, catalog_barcodes=barcodes))
+        return counts
+
+    def _ensure_product_cache(self) -> None:
+        if self._product_cache_loaded:
+            return
+        # Like load_product_index: an upsert committing between the read and the
+        # load would be overwritten by the stale snapshot in a "complete" cache.
+        with self._write_lock, self._read() as conn:
+            if self._product_cache_loaded:
+                return
+            total = int(conn.execute("SELECT COUNT(1) AS c FROM products").fetchone()["c"])
+            rows = conn.execute(
+                "SELECT * FROM products ORDER BY barcode ASC LIMIT ?",
+                (self.product_cache.max_entries,),
+            ).fetchall()
+            self.product_cache.load(rows, total)
+            self._product_cache_loaded = True
+
+    def complete_products(self, prefix: str, limit: int = COMPLETION_LIMIT) -> list[tuple[str, str]]:
+        """(barcode, name) pairs whose barcode or name starts with prefix, for input completion."""
+        self.load_product_index()
+        return self.product_index.search(prefix, limit)
+
+    def load_product_index(self) -> None:
+        if self.product_index.loaded:
+            return
+        # Hold the write lock so no upsert lands between the read and the load.
+        with self._write_lock, self._read() as conn:
+            rows = conn.execute("SELECT barcode, name FROM products").fetchall()
+            self.product_index.load((row["barcode"], row["name"]) for row in rows)
+
+    def product_cache_stats(self) -> dict[str, int | bool]:
+        return self.product_cache.stats()
 
     def list_product_barcodes(self) -> list[str]:
-        with self._connect() as conn:
+        self._ensure_product_cache()
+        cached = self.product_cache.barcodes()
+        if cached is not None:
+            return cached
+        with self._read() as conn:
             rows = conn.execute("SELECT barcode FROM products ORDER BY barcode ASC").fetchall()
         return [str(row["barcode"]) for row in rows]
 
     def get_product(self, barcode: str) -> sqlite3.Row | None:
-        with self._connect() as conn:
-            return conn.execute(
+        self._ensure_product_cache()
+        found, row = self.product_cache.get(barcode)
+        if found:
+            return row
+        with self._read() as conn:
+            row = conn.execute(
                 "SELECT * FROM products WHERE barcode = ?",
                 (barcode,),
             ).fetchone()
+        if row is not None:
+            self.product_cache.put(row)
+        return row
+
+    @staticmethod
+    def _index_product_search(conn: sqlite3.Connection, products: Iterable[sqlite3.Row]) -> None:
+        products = list(products)
+        conn.executemany(
+            "INSERT OR IGNORE INTO product_search_ids(barcode) VALUES (?)",
+            [(row["barcode"],) for row in products],
+        )
+        conn.executemany(
+            """
+            INSERT OR REPLACE INTO products_fts(rowid, barcode, chars, category, initials)
+            SELECT id, ?, ?, ?, ? FROM product_search_ids WHERE barcode = ?
+            """,
+            [
+                (
+                    _search_tokens(row["barcode"]),
+                    _search_tokens(row["name"]),
+                    _search_tokens(row["category"]),
+                    " ".join(pinyin_initials(str(row["name"]))),
+                    row["barcode"],
+                )
+                for row in products
+            ],
+        )
+
+    def search_products(self, query: str, limit: int = SEARCH_LIMIT) -> list[sqlite3.Row]:
+        """
+        Products matching query, best first: a substring of the name or category,
+        consecutive pinyin initials of the name ("kkkl" -> 可口可乐), or a substring of the barcode.
+        """
+        expression = _search_match_expression(query)
+        if expression is None or limit <= 0:
+            return []
+        # A one-character query matches most of the catalog and every hit scores
+        # alike; skipping bm25 lets LIMIT stop the scan early.
+        order_by = "" if len(query.strip()) == 1 else "ORDER BY bm25(products_fts, 10.0, 5.0, 1.0, 3.0), p.barcode"
+        with self._read() as conn:
+            return conn.execute(
+                f"""
+                SELECT p.*
+                FROM products_fts f
+                JOIN product_search_ids s ON s.id = f.rowid
+                JOIN products p ON p.barcode = s.barcode
+                WHERE products_fts MATCH ?
+                {order_by}
+                LIMIT ?
+                """,
+                (expression, int(limit)),
+            ).fetchall()
 
-    def list_products_with_stock(self) -> list[sqlite3.Row]:
-        with self._connect() as conn:
+    def list_products_with_stock(self, barcodes: Iterable[str] | None = None) -> list[sqlite3.Row]:
+        """All products with their stock, or only the given barcodes."""
+        where = ""
+        params: tuple[Any, ...] = ()
+        if barcodes is not None:
+            where = "WHERE p.barcode IN (SELECT value FROM json_each(?))"
+            params = (json.dumps(list(barcodes)),)
+        with self._read() as conn:
             return conn.execute(
-                """
+                f"""
                 SELECT
                     p.barcode,
                     p.name,
@@ -341,12 +1152,14 @@ class InventoryDB:
                     COALESCE(t.current_qty, 0) AS current_stock
                 FROM products p
                 LEFT JOIN stock_totals t ON t.barcode = p.barcode
+                {where}
                 ORDER BY p.name
-                """
+                """,
+                params,
             ).fetchall()
 
     def get_current_stock(self, barcode: str) -> int:
-        with self._connect() as conn:
+        with self._read() as conn:
             row = conn.execute(
                 "SELECT COALESCE(current_qty, 0) AS qty FROM stock_totals WHERE barcode = ?",
                 (barcode,),
@@ -361,38 +1174,83 @@ class InventoryDB:
         batch_no: str | None = None,
         expiry_date: str | None = None,
     ) -> None:
-        if quantity <= 0:
-            raise ValueError("quantity must be > 0")
-        if not self.get_product(barcode):
-            raise ValueError("product not found")
+        errors = self.stock_in_many([StockInLine(barcode, quantity, batch_no, expiry_date)], stock_type)
+        if errors:
+            raise ValueError(errors[0][1])
+
+    def stock_in_many(self, lines: Iterable[StockInLine], stock_type: str = "采购") -> list[tuple[int, str]]:
+        """
+        Receive a whole delivery in one transaction. Lines that fail validation
+        are skipped and returned as (position in lines, message); all other
+        lines are written, sharing one timestamp.
+        """
+        lines = list(lines)
+        errors: list[tuple[int, str]] = []
+        if not lines:
+            return errors
 
         with self._transaction() as conn:
-            conn.execute(
+            purchase_prices = {
+                str(row["barcode"]): float(row["purchase_price"])
+                for row in conn.execute(
+                    """
+                    SELECT barcode, purchase_price
+                    FROM products
+                    WHERE barcode IN (SELECT value FROM json_each(?))
+                    """,
+                    (json.dumps(list({line.barcode for line in lines})),),
+                ).fetchall()
+            }
+
+            accepted: list[StockInLine] = []
+            for position, line in enumerate(lines):
+                if line.quantity <= 0:
+                    errors.append((position, "quantity must be > 0"))
+                elif line.barcode not in purchase_prices:
+                    errors.append((position, "product not found"))
+                else:
+                    accepted.append(line)
+            if not accepted:
+                return errors
+
+            timestamp = str(conn.execute("SELECT CURRENT_TIMESTAMP").fetchone()[0])
+            day = timestamp[:10]
+            conn.executemany(
                 """
-                INSERT INTO stock_logs (barcode, change_qty, type)
-                VALUES (?, ?, ?)
+                INSERT INTO stock_logs (barcode, change_qty, type, timestamp)
+                VALUES (?, ?, ?, ?)
                 """,
-                (barcode, quantity, stock_type),
+                [(line.barcode, line.quantity, stock_type, timestamp) for line in accepted],
             )
-            conn.execute(
+            conn.executemany(
                 """
-                INSERT INTO stock_totals(barcode, current_qty)
-                VALUES (?, ?)
-                ON CONFLICT(barcode) DO UPDATE SET current_qty = current_qty + excluded.current_qty
+                INSERT INTO expiry_management (barcode, batch_no, expiry_date, current_qty)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(barcode, batch_no, expiry_date) DO UPDATE SET
+                    current_qty = current_qty + excluded.current_qty
                 """,
-                (barcode, quantity),
+                [
+                    (line.barcode, line.batch_no, line.expiry_date, line.quantity)
+                    for line in accepted
+                    if line.batch_no and line.expiry_date
+                ],
             )
 
-            if batch_no and expiry_date:
-                conn.execute(
-                    """
-                    INSERT INTO expiry_management (barcode, batch_no, expiry_date, current_qty)
-                    VALUES (?, ?, ?, ?)
-                    ON CONFLICT(barcode, batch_no, expiry_date) DO UPDATE SET
-                        current_qty = current_qty + excluded.current_qty
-                    """,
-                    (barcode, batch_no, expiry_date, quantity),
-                )
+            if stock_type == "采购":
+                received: dict[str, int] = {}
+                for line in accepted:
+                    received[line.barcode] = received.get(line.barcode, 0) + line.quantity
+                rollups = [
+                    (day, barcode, 0, 0.0, 0.0, qty, qty * purchase_prices[barcode])
+                    for barcode, qty in received.items()
+                ]
+                total_qty = sum(received.values())
+                total_cost = sum(row[6] for row in rollups)
+                rollups.append((day, DAY_TOTAL_BARCODE, 0, 0.0, 0.0, total_qty, total_cost))
+                self._bump_daily_rollups(conn, rollups)
+
+        self._publish(ChangeSet(barcodes={line.barcode for line in accepted}, days={day}))
+        return errors
 
     def stock_out(
         self,
@@ -404,34 +1262,48 @@ class InventoryDB:
         if not items:
             raise ValueError("cart is empty")
 
+        # Merge repeated barcodes so stock is checked against the combined quantity.
+        quantities: dict[str, int] = {}
+        for item in items:
+            quantities[item.barcode] = quantities.get(item.barcode, 0) + int(item.quantity)
+
         total_due = 0.0
         cost = 0.0
 
         with self._transaction() as conn:
+            products = {
+                str(row["barcode"]): row
+                for row in conn.execute(
+                    """
+                    SELECT
+                        p.barcode,
+                        p.name,
+                        p.purchase_price,
+                        p.retail_price,
+                        COALESCE(t.current_qty, 0) AS current_stock
+                    FROM products p
+                    LEFT JOIN stock_totals t ON t.barcode = p.barcode
+                    WHERE p.barcode IN (SELECT value FROM json_each(?))
+                    """,
+                    (json.dumps(list(quantities)),),
+                ).fetchall()
+            }
+
             order_lines: list[tuple[str, str, int, float, float]] = []
-            for item in items:
-                product = conn.execute(
-                    "SELECT * FROM products WHERE barcode = ?",
-                    (item.barcode,),
-                ).fetchone()
+            for barcode, quantity in quantities.items():
+                product = products.get(barcode)
                 if not product:
-                    raise ValueError(f"product not found: {item.barcode}")
+                    raise ValueError(f"product not found: {barcode}")
 
-                stock_row = conn.execute(
-                    "SELECT COALESCE(current_qty, 0) AS qty FROM stock_totals WHERE barcode = ?",
-                    (item.barcode,),
-                ).fetchone()
-                stock = int(stock_row["qty"]) if stock_row else 0
-                if stock < item.quantity:
+                stock = int(product["current_stock"])
+                if stock < quantity:
                     raise ValueError(f"库存不足: {product['name']} (当前 {stock})")
 
                 unit_retail = float(product["retail_price"])
                 unit_purchase = float(product["purchase_price"])
-                total_due += unit_retail * item.quantity
-                cost += unit_purchase * item.quantity
-                order_lines.append(
-                    (item.barcode, str(product["name"]), int(item.quantity), unit_retail, unit_purchase)
-                )
+                total_due += unit_retail * quantity
+                cost += unit_purchase * quantity
+                order_lines.append((barcode, str(product["name"]), quantity, unit_retail, unit_purchase))
 
             final_received = round(total_due if received_amount is None else float(received_amount), 2)
             total_due = round(total_due, 2)
@@ -449,6 +1321,12 @@ class InventoryDB:
                 (total_due, final_received, discount),
             )
             sale_order_id = int(order_cursor.lastrowid)
+            order_day = str(
+                conn.execute(
+                    "SELECT timestamp FROM sales_orders WHERE id = ?",
+                    (sale_order_id,),
+                ).fetchone()["timestamp"]
+            )[:10]
 
             customer_received = None if received_amount is None else final_received
             customer_order_cursor = conn.execute(
@@ -490,28 +1368,29 @@ class InventoryDB:
                 ],
             )
 
-            for barcode, _name, quantity, _unit_retail, _unit_purchase in order_lines:
-                conn.execute(
-                    """
-                    INSERT INTO stock_logs (barcode, change_qty, type, sale_order_id)
-                    VALUES (?, ?, ?, ?)
-                    """,
-                    (barcode, -quantity, stock_type, sale_order_id),
-                )
-                conn.execute(
-                    """
-                    INSERT INTO stock_totals(barcode, current_qty)
-                    VALUES (?, ?)
-                    ON CONFLICT(barcode) DO UPDATE SET current_qty = current_qty + excluded.current_qty
-                    """,
-                    (barcode, -quantity),
-                )
-                self._consume_expiry_batches(
-                    conn=conn,
-                    barcode=barcode,
-                    quantity=quantity,
-                )
+            conn.executemany(
+                """
+                INSERT INTO stock_logs (barcode, change_qty, type, sale_order_id)
+                VALUES (?, ?, ?, ?)
+                """,
+                [
+                    (barcode, -quantity, stock_type, sale_order_id)
+                    for barcode, _name, quantity, _unit_retail, _unit_purchase in order_lines
+                ],
+            )
+            self._consume_expiry_batches(conn=conn, quantities=quantities)
+            self._bump_daily_rollups(
+                conn,
+                [
+                    (order_day, barcode, quantity, quantity * unit_retail, quantity * unit_purchase, 0, 0.0)
+                    for barcode, _name, quantity, unit_retail, unit_purchase in order_lines
+                ]
+                + [(order_day, DAY_TOTAL_BARCODE, sum(quantities.values()), final_received, cost, 0, 0.0)],
+            )
 
+        self._publish(
+            ChangeSet(barcodes=set(quantities), customer_order_ids={customer_order_id}, days={order_day})
+        )
         return {
             "total_due": total_due,
             "total_received": final_received,
@@ -522,46 +1401,67 @@ class InventoryDB:
         }
 
     def get_low_stock_products(self) -> list[sqlite3.Row]:
-        with self._connect() as conn:
+        with self._read() as conn:
             return conn.execute(
                 """
                 SELECT
                     p.barcode,
                     p.name,
                     p.min_stock,
-                    COALESCE(t.current_qty, 0) AS current_stock
-                FROM products p
-                LEFT JOIN stock_totals t ON t.barcode = p.barcode
-                WHERE COALESCE(t.current_qty, 0) < p.min_stock
-                ORDER BY current_stock ASC
+                    a.current_qty AS current_stock
+                FROM stock_alerts a
+                JOIN products p ON p.barcode = a.barcode
+                WHERE a.kind = 'low_stock'
+                ORDER BY a.current_qty ASC
                 """
             ).fetchall()
 
     def get_expiring_batches(self, within_days: int) -> list[sqlite3.Row]:
         target_date = date.today().toordinal() + within_days
         end = date.fromordinal(target_date).isoformat()
-        with self._connect() as conn:
+        with self._read() as conn:
             return conn.execute(
                 """
                 SELECT
-                    e.barcode,
+                    a.barcode,
                     p.name,
-                    e.batch_no,
-                    e.expiry_date,
-                    e.current_qty
-                FROM expiry_management e
-                JOIN products p ON p.barcode = e.barcode
-                WHERE e.current_qty > 0
-                  AND e.expiry_date <= ?
-                ORDER BY e.expiry_date ASC
+                    a.batch_no,
+                    a.expiry_date,
+                    a.current_qty
+                FROM stock_alerts a
+                JOIN products p ON p.barcode = a.barcode
+                WHERE a.kind = 'expiry'
+                  AND a.expiry_date <= ?
+                ORDER BY a.expiry_date ASC
                 """,
                 (end,),
             ).fetchall()
 
-    def _load_main_day_logs(self, day: str) -> list[dict[str, Any]]:
-        with self._connect() as conn:
-            rows = conn.execute(
-                """
+    @staticmethod
+    def _log_row_to_dict(row: sqlite3.Row) -> dict[str, Any]:
+        return {
+            "source_id": int(row["source_id"]),
+            "timestamp": str(row["timestamp"]),
+            "type": str(row["type"]),
+            "barcode": str(row["barcode"]),
+            "name": str(row["name"]),
+            "change_qty": int(row["change_qty"]),
+            "purchase_price": float(row["purchase_price"]),
+            "retail_price": float(row["retail_price"]),
+            "sale_order_id": int(row["sale_order_id"]) if row["sale_order_id"] is not None else None,
+        }
+
+    @staticmethod
+    def _log_type_filter(types: Iterable[str] | None, column: str = "type") -> tuple[str, tuple[Any, ...]]:
+        if types is None:
+            return "", ()
+        return f"AND {column} IN (SELECT value FROM json_each(?))", (json.dumps(list(types)),)
+
+    def _iter_main_logs(self, start: str, end: str, types: Iterable[str] | None = None) -> Iterator[dict[str, Any]]:
+        type_filter, type_params = self._log_type_filter(types, "l.type")
+        with self._read() as conn:
+            cursor = conn.execute(
+                f"""
                 SELECT
                     l.id AS source_id,
                     l.timestamp,
@@ -574,39 +1474,29 @@ class InventoryDB:
                     l.sale_order_id
                 FROM stock_logs l
                 JOIN products p ON p.barcode = l.barcode
-                WHERE DATE(l.timestamp) = ?
+                WHERE l.timestamp >= ? AND l.timestamp < ? {type_filter}
                 ORDER BY l.timestamp ASC, l.id ASC
                 """,
-                (day,),
-            ).fetchall()
-
-        return [
-            {
-                "source_id": int(row["source_id"]),
-                "timestamp": str(row["timestamp"]),
-                "type": str(row["type"]),
-                "barcode": str(row["barcode"]),
-                "name": str(row["name"]),
-                "change_qty": int(row["change_qty"]),
-                "purchase_price": float(row["purchase_price"]),
-                "retail_price": float(row["retail_price"]),
-                "sale_order_id": int(row["sale_order_id"]) if row["sale_order_id"] is not None else None,
-            }
-            for row in rows
-        ]
-
-    def _load_archive_day_logs(self, day: str) -> list[dict[str, Any]]:
-        month_key = day[:7]
+                (start, end, *type_params),
+            )
+            try:
+                for row in cursor:
+                    yield self._log_row_to_dict(row)
+            finally:
+                cursor.close()
+
+    def _iter_archive_logs(
+        self, month_key: str, start: str, end: str, types: Iterable[str] | None = None
+    ) -> Iterator[dict[str, Any]]:
         archive_path = self._archive_db_path(month_key)
         if not archive_path.exists():
-            return []
+            return
+        type_filter, type_params = self._log_type_filter(types)
 
-        archive_conn = sqlite3.connect(archive_path)
-        archive_conn.row_factory = sqlite3.Row
+        archive_conn = self._open_archive_for_read(archive_path)
         try:
-            self._ensure_archive_schema(archive_conn)
-            rows = archive_conn.execute(
-                """
+            cursor = archive_conn.execute(
+                f"""
                 SELECT
                     source_id,
                     timestamp,
@@ -618,78 +1508,90 @@ class InventoryDB:
                     retail_price,
                     sale_order_id
                 FROM archived_stock_logs
-                WHERE DATE(timestamp) = ?
+                WHERE timestamp >= ? AND timestamp < ? {type_filter}
                 ORDER BY timestamp ASC, source_id ASC
                 """,
-                (day,),
-            ).fetchall()
+                (start, end, *type_params),
+            )
+            for row in cursor:
+                yield self._log_row_to_dict(row)
         finally:
             archive_conn.close()
 
-        return [
-            {
-                "source_id": int(row["source_id"]),
-                "timestamp": str(row["timestamp"]),
-                "type": str(row["type"]),
-                "barcode": str(row["barcode"]),
-                "name": str(row["name"]),
-                "change_qty": int(row["change_qty"]),
-                "purchase_price": float(row["purchase_price"]),
-                "retail_price": float(row["retail_price"]),
-                "sale_order_id": int(row["sale_order_id"]) if row["sale_order_id"] is not None else None,
-            }
-            for row in rows
+    def iter_logs(
+        self,
+        start_date: date,
+        end_date: date,
+        types: Iterable[str] | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """
+        Stream stock logs for the inclusive date range in (timestamp, source_id) order,
+        optionally only the given log types (采购/销售...). Each monthly archive in range
+        is opened once and all shards are merged lazily, so memory stays flat however
+        long the range is.
+        """
+        if end_date < start_date:
+            raise ValueError("end_date must not be earlier than start_date")
+        start, end = start_date.isoformat(), (end_date + timedelta(days=1)).isoformat()
+        types = list(types) if types is not None else None
+
+        shards = [
+            self._iter_archive_logs(month_key, start, end, types) for month_key in _month_keys(start_date, end_date)
         ]
+        shards.append(self._iter_main_logs(start, end, types))
+        last_key: tuple[str, int] | None = None
+        for row in heapq.merge(*shards, key=lambda row: (row["timestamp"], row["source_id"])):
+            # While a month is being archived a chunk can briefly exist in both places.
+            key = (row["timestamp"], row["source_id"])
+            if key == last_key:
+                continue
+            last_key = key
+            yield row
+
+    def count_logs(self, start_date: date, end_date: date, types: Iterable[str] | None = None) -> int:
+        """Number of rows iter_logs would yield (approximate while a month is mid-archive)."""
+        if end_date < start_date:
+            raise ValueError("end_date must not be earlier than start_date")
+        start, end = start_date.isoformat(), (end_date + timedelta(days=1)).isoformat()
+        types = list(types) if types is not None else None
+        type_filter, type_params = self._log_type_filter(types)
+        sql = f"SELECT COUNT(1) FROM {{table}} WHERE timestamp >= ? AND timestamp < ? {type_filter}"
+
+        total = 0
+        for month_key in _month_keys(start_date, end_date):
+            archive_path = self._archive_db_path(month_key)
+            if not archive_path.exists():
+                continue
+            archive_conn = self._open_archive_for_read(archive_path)
+            try:
+                total += int(
+                    archive_conn.execute(sql.format(table="archived_stock_logs"), (start, end, *type_params)).fetchone()[0]
+                )
+            finally:
+                archive_conn.close()
+        with self._read() as conn:
+            total += int(conn.execute(sql.format(table="stock_logs"), (start, end, *type_params)).fetchone()[0])
+        return total
 
     def _load_day_logs(self, for_date: date | None = None) -> list[dict[str, Any]]:
-        day = (for_date or date.today()).isoformat()
-        merged = self._load_archive_day_logs(day) + self._load_main_day_logs(day)
-        merged.sort(key=lambda row: (str(row["timestamp"]), int(row["source_id"])))
-        return merged
+        day = for_date or date.today()
+        return list(self.iter_logs(day, day))
 
     def get_daily_summary(self, for_date: date | None = None) -> dict[str, float]:
-        logs = self._load_day_logs(for_date=for_date)
         day = (for_date or date.today()).isoformat()
-
-        purchase_cost = 0.0
-        legacy_sales_revenue = 0.0
-        legacy_sales_cost = 0.0
-
-        for row in logs:
-            qty = int(row["change_qty"])
-            purchase_price = float(row["purchase_price"])
-            retail_price = float(row["retail_price"])
-            if row["type"] == "采购":
-                purchase_cost += qty * purchase_price
-            elif row["type"] == "销售" and row.get("sale_order_id") is None:
-                # Backward compatibility for legacy sales before sales_orders existed.
-                legacy_sales_revenue += -qty * retail_price
-                legacy_sales_cost += -qty * purchase_price
-
-        with self._connect() as conn:
-            order_row = conn.execute(
-                """
-                SELECT COALESCE(SUM(total_received), 0) AS revenue
-                FROM sales_orders
-                WHERE DATE(timestamp) = ?
-                """,
-                (day,),
-            ).fetchone()
-            order_revenue = float(order_row["revenue"])
-
-            order_cost_row = conn.execute(
+        with self._read() as conn:
+            row = conn.execute(
                 """
-                SELECT COALESCE(SUM(i.quantity * i.unit_purchase_price), 0) AS order_cost
-                FROM sales_orders o
-                JOIN sales_order_items i ON i.order_id = o.id
-                WHERE DATE(o.timestamp) = ?
+                SELECT sales_revenue, sales_cost, purchase_cost
+                FROM daily_rollups
+                WHERE day = ? AND barcode = ?
                 """,
-                (day,),
+                (day, DAY_TOTAL_BARCODE),
             ).fetchone()
-            order_sales_cost = float(order_cost_row["order_cost"])
 
-        revenue = order_revenue + legacy_sales_revenue
-        sales_cost = order_sales_cost + legacy_sales_cost
+        revenue = float(row["sales_revenue"]) if row else 0.0
+        sales_cost = float(row["sales_cost"]) if row else 0.0
+        purchase_cost = float(row["purchase_cost"]) if row else 0.0
         gross_profit = revenue - sales_cost
 
         return {
@@ -698,39 +1600,216 @@ class InventoryDB:
             "gross_profit": round(gross_profit, 2),
         }
 
-    def _consume_expiry_batches(self, conn: sqlite3.Connection, barcode: str, quantity: int) -> None:
-        """
-        Consume tracked batches in FIFO-by-expiry order.
-        If part of stock has no batch info, that remainder stays untracked.
-        """
-        remaining = quantity
-        rows = conn.execute(
-            """
-            SELECT barcode, batch_no, expiry_date, current_qty
-            FROM expiry_management
-            WHERE barcode = ? AND current_qty > 0
-            ORDER BY expiry_date ASC, batch_no ASC
-            """,
-            (barcode,),
-        ).fetchall()
+    def get_range_summary(self, start_date: date, end_date: date) -> dict[str, float]:
+        if end_date < start_date:
+            raise ValueError("end_date must not be earlier than start_date")
+        with self._read() as conn:
+            row = conn.execute(
+                """
+                SELECT
+                    COALESCE(SUM(sales_revenue), 0) AS revenue,
+                    COALESCE(SUM(sales_cost), 0) AS sales_cost,
+                    COALESCE(SUM(purchase_cost), 0) AS purchase_cost
+                FROM daily_rollups
+                WHERE day >= ? AND day <= ? AND barcode = ?
+                """,
+                (start_date.isoformat(), end_date.isoformat(), DAY_TOTAL_BARCODE),
+            ).fetchone()
 
-        for row in rows:
-            if remaining <= 0:
-                break
-            consume = min(remaining, int(row["current_qty"]))
-            conn.execute(
+        revenue = float(row["revenue"])
+        return {
+            "revenue": round(revenue, 2),
+            "purchase_cost": round(float(row["purchase_cost"]), 2),
+            "gross_profit": round(revenue - float(row["sales_cost"]), 2),
+        }
+
+    def list_daily_rollups(self, start_date: date, end_date: date) -> list[sqlite3.Row]:
+        """Per-day totals for the inclusive range, oldest first; days without activity are omitted."""
+        with self._read() as conn:
+            return conn.execute(
                 """
-                UPDATE expiry_management
-                SET current_qty = current_qty - ?
-                WHERE barcode = ? AND batch_no = ? AND expiry_date = ?
+                SELECT day, sales_qty, sales_revenue, sales_cost, purchase_qty, purchase_cost
+                FROM daily_rollups
+                WHERE day >= ? AND day <= ? AND barcode = ?
+                ORDER BY day ASC
                 """,
-                (consume, row["barcode"], row["batch_no"], row["expiry_date"]),
+                (start_date.isoformat(), end_date.isoformat(), DAY_TOTAL_BARCODE),
+            ).fetchall()
+
+    def _bump_daily_rollups(
+        self,
+        conn: sqlite3.Connection,
+        rows: list[tuple[str, str, int, float, float, int, float]],
+    ) -> None:
+        """Add (day, barcode, sales_qty, sales_revenue, sales_cost, purchase_qty, purchase_cost) deltas."""
+        conn.executemany(
+            """
+            INSERT INTO daily_rollups
+            (day, barcode, sales_qty, sales_revenue, sales_cost, purchase_qty, purchase_cost)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(day, barcode) DO UPDATE SET
+                sales_qty = sales_qty + excluded.sales_qty,
+                sales_revenue = sales_revenue + excluded.sales_revenue,
+                sales_cost = sales_cost + excluded.sales_cost,
+                purchase_qty = purchase_qty + excluded.purchase_qty,
+                purchase_cost = purchase_cost + excluded.purchase_cost
+            """,
+            rows,
+        )
+
+    def _ensure_daily_rollups_backfilled(self) -> None:
+        with self._read() as conn:
+            has_rollups = conn.execute("SELECT 1 FROM daily_rollups LIMIT 1").fetchone() is not None
+            has_history = (
+                conn.execute("SELECT 1 FROM sales_orders LIMIT 1").fetchone() is not None
+                or conn.execute("SELECT 1 FROM stock_logs LIMIT 1").fetchone() is not None
+            )
+        if not has_rollups and (has_history or any(self.archive_dir.glob("stock_logs_*.db"))):
+            self.rebuild_daily_rollups()
+
+    def rebuild_daily_rollups(self) -> int:
+        """
+        Recompute daily_rollups from sales orders, current-month logs and every
+        monthly archive. Returns the number of rollup rows written.
+        """
+        # Purchases and legacy sales (recorded before sales_orders existed) come from logs.
+        log_aggregate_sql = """
+            SELECT
+                SUBSTR(timestamp, 1, 10) AS day,
+                barcode,
+                SUM(CASE WHEN type = '销售' THEN -change_qty ELSE 0 END) AS sales_qty,
+                SUM(CASE WHEN type = '销售' THEN -change_qty * retail_price ELSE 0 END) AS sales_revenue,
+                SUM(CASE WHEN type = '销售' THEN -change_qty * purchase_price ELSE 0 END) AS sales_cost,
+                SUM(CASE WHEN type = '采购' THEN change_qty ELSE 0 END) AS purchase_qty,
+                SUM(CASE WHEN type = '采购' THEN change_qty * purchase_price ELSE 0 END) AS purchase_cost
+            FROM {source}
+            WHERE type = '采购' OR (type = '销售' AND sale_order_id IS NULL)
+            GROUP BY day, barcode
+        """
+        # Keep the archiver out for the whole rebuild: a chunk moving from stock_logs
+        # to its archive between the two reads would be counted twice or not at all.
+        with self._archive_lock:
+            log_rows: list[sqlite3.Row] = []
+            for archive_path in sorted(self.archive_dir.glob("stock_logs_*.db")):
+                archive_conn = self._open_archive_for_read(archive_path)
+                try:
+                    log_rows.extend(
+                        archive_conn.execute(log_aggregate_sql.format(source="archived_stock_logs")).fetchall()
+                    )
+                finally:
+                    archive_conn.close()
+
+            with self._transaction() as conn:
+                log_rows.extend(
+                    conn.execute(
+                        log_aggregate_sql.format(
+                            source="""(
+                                SELECT l.timestamp, l.type, l.barcode, l.change_qty, l.sale_order_id,
+                                       p.purchase_price, p.retail_price
+                                FROM stock_logs l
+                                JOIN products p ON p.barcode = l.barcode
+                            )"""
+                        )
+                    ).fetchall()
+                )
+
+                conn.execute("DELETE FROM daily_rollups")
+                conn.execute(
+                    """
+                    INSERT INTO daily_rollups (day, barcode, sales_qty, sales_revenue, sales_cost)
+                    SELECT
+                        SUBSTR(o.timestamp, 1, 10),
+                        i.barcode,
+                        SUM(i.quantity),
+                        SUM(i.quantity * i.unit_retail_price),
+                        SUM(i.quantity * i.unit_purchase_price)
+                    FROM sales_orders o
+                    JOIN sales_order_items i ON i.order_id = o.id
+                    GROUP BY SUBSTR(o.timestamp, 1, 10), i.barcode
+                    """
+                )
+                conn.execute(
+                    """
+                    INSERT INTO daily_rollups (day, barcode, sales_qty, sales_revenue, sales_cost)
+                    SELECT
+                        SUBSTR(o.timestamp, 1, 10),
+                        ?,
+                        COALESCE(SUM(i.qty), 0),
+                        SUM(o.total_received),
+                        COALESCE(SUM(i.cost), 0)
+                    FROM sales_orders o
+                    LEFT JOIN (
+                        SELECT order_id, SUM(quantity) AS qty, SUM(quantity * unit_purchase_price) AS cost
+                        FROM sales_order_items
+                        GROUP BY order_id
+                    ) i ON i.order_id = o.id
+                    GROUP BY SUBSTR(o.timestamp, 1, 10)
+                    """,
+                    (DAY_TOTAL_BARCODE,),
+                )
+
+                deltas: list[tuple[str, str, int, float, float, int, float]] = []
+                for row in log_rows:
+                    values = (
+                        int(row["sales_qty"]),
+                        float(row["sales_revenue"]),
+                        float(row["sales_cost"]),
+                        int(row["purchase_qty"]),
+                        float(row["purchase_cost"]),
+                    )
+                    deltas.append((str(row["day"]), str(row["barcode"]), *values))
+                    deltas.append((str(row["day"]), DAY_TOTAL_BARCODE, *values))
+                self._bump_daily_rollups(conn, deltas)
+
+                rows = int(conn.execute("SELECT COUNT(1) AS c FROM daily_rollups").fetchone()["c"])
+
+        self._publish(ChangeSet(everything=True))
+        return rows
+
+    def _consume_expiry_batches(self, conn: sqlite3.Connection, quantities: dict[str, int]) -> None:
+        """
+        Consume tracked batches in FIFO-by-expiry order for every barcode at once.
+        Each batch takes min(its qty, what is still needed after earlier batches);
+        if part of stock has no batch info, that remainder stays untracked.
+        """
+        conn.execute(
+            """
+            WITH need AS (
+                SELECT
+                    json_extract(value, '$[0]') AS barcode,
+                    json_extract(value, '$[1]') AS qty
+                FROM json_each(?)
+            ),
+            ranked AS (
+                SELECT
+                    e.rowid AS batch_rowid,
+                    e.current_qty,
+                    n.qty AS need_qty,
+                    COALESCE(
+                        SUM(e.current_qty) OVER (
+                            PARTITION BY e.barcode
+                            ORDER BY e.expiry_date ASC, e.batch_no ASC
+                            ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                        ),
+                        0
+                    ) AS consumed_before
+                FROM expiry_management e
+                JOIN need n ON n.barcode = e.barcode
+                WHERE e.current_qty > 0
             )
-            remaining -= consume
+            UPDATE expiry_management
+            SET current_qty = expiry_management.current_qty
+                - MIN(ranked.current_qty, ranked.need_qty - ranked.consumed_before)
+            FROM ranked
+            WHERE expiry_management.rowid = ranked.batch_rowid
+              AND ranked.consumed_before < ranked.need_qty
+            """,
+            (json.dumps(list(quantities.items())),),
+        )
 
     def list_customer_orders(self, for_date: date | None = None) -> list[sqlite3.Row]:
-        day = (for_date or date.today()).isoformat()
-        with self._connect() as conn:
+        start, end = _day_range((for_date or date.today()).isoformat())
+        with self._read() as conn:
             return conn.execute(
                 """
                 SELECT
@@ -742,14 +1821,14 @@ class InventoryDB:
                     created_at,
                     updated_at
                 FROM customer_orders
-                WHERE DATE(created_at) = ?
+                WHERE created_at >= ? AND created_at < ?
                 ORDER BY created_at DESC, id DESC
                 """,
-                (day,),
+                (start, end),
             ).fetchall()
 
     def get_customer_order_items(self, customer_order_id: int) -> list[sqlite3.Row]:
-        with self._connect() as conn:
+        with self._read() as conn:
             return conn.execute(
                 """
                 SELECT
@@ -774,7 +1853,7 @@ class InventoryDB:
         with self._transaction() as conn:
             row = conn.execute(
                 """
-                SELECT id, sale_order_id, total_due
+                SELECT id, sale_order_id, total_due, created_at
                 FROM customer_orders
                 WHERE id = ?
                 """,
@@ -807,6 +1886,16 @@ class InventoryDB:
 
             sale_order_id = row["sale_order_id"]
             if sale_order_id is not None and normalized_received is not None:
+                order_row = conn.execute(
+                    "SELECT timestamp, total_received FROM sales_orders WHERE id = ?",
+                    (int(sale_order_id),),
+                ).fetchone()
+                if order_row is not None:
+                    received_delta = normalized_received - float(order_row["total_received"])
+                    self._bump_daily_rollups(
+                        conn,
+                        [(str(order_row["timestamp"])[:10], DAY_TOTAL_BARCODE, 0, received_delta, 0.0, 0, 0.0)],
+                    )
                 discount = round(due - normalized_received, 2)
                 conn.execute(
                     """
@@ -817,5 +1906,9 @@ class InventoryDB:
                     (normalized_received, discount, int(sale_order_id)),
                 )
 
+        self._publish(
+            ChangeSet(customer_order_ids={customer_order_id}, days={str(row["created_at"])[:10]})
+        )
+
     def get_daily_transactions(self, for_date: date | None = None) -> list[dict[str, Any]]:
         return self._load_day_logs(for_date=for_date)
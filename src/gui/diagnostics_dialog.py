@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import (
+    QAbstractItemView,
+    QCheckBox,
+    QDialog,
+    QFormLayout,
+    QHBoxLayout,
+    QHeaderView,
+    QLabel,
+    QPushButton,
+    QSpinBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+)
+
+from src.db_instrumentation import QueryInstrumentation
+
+METHOD_HEADERS = ("方法", "次数", "平均(ms)", "p50", "p95", "p99", "最大(ms)")
+STATEMENT_HEADERS = ("SQL", "次数", "总耗时(ms)", "单次最大(ms)", "行数")
+REFRESH_INTERVAL_MS = 1000
+
+
+class DiagnosticsDialog(QDialog):
+    """Switch query timing on/off and watch per-method latency and the costliest SQL."""
+
+    def __init__(self, instrumentation: QueryInstrumentation, parent=None):
+        super().__init__(parent)
+        self.instrumentation = instrumentation
+        self.setWindowTitle("诊断 - 查询计时")
+        self.resize(900, 600)
+        layout = QVBoxLayout(self)
+
+        form = QFormLayout()
+        self.enabled_check = QCheckBox("启用查询计时（关闭时几乎无开销）")
+        self.enabled_check.setChecked(instrumentation.enabled)
+        self.enabled_check.toggled.connect(self._on_enabled_toggled)
+        self.threshold_spin = QSpinBox()
+        self.threshold_spin.setRange(1, 60000)
+        self.threshold_spin.setSuffix(" ms")
+        self.threshold_spin.setValue(int(instrumentation.slow_threshold_ms))
+        self.threshold_spin.valueChanged.connect(self._on_threshold_changed)
+        form.addRow(self.enabled_check)
+        form.addRow("慢查询阈值", self.threshold_spin)
+        form.addRow("慢查询日志", QLabel(str(instrumentation.log_path)))
+        layout.addLayout(form)
+
+        layout.addWidget(QLabel("按方法（含等待连接与提交）"))
+        self.methods_table = self._make_table(METHOD_HEADERS)
+        layout.addWidget(self.methods_table, 1)
+        layout.addWidget(QLabel("按 SQL 语句（含读取结果行）"))
+        self.statements_table = self._make_table(STATEMENT_HEADERS)
+        layout.addWidget(self.statements_table, 2)
+
+        buttons = QHBoxLayout()
+        refresh_btn = QPushButton("刷新")
+        refresh_btn.clicked.connect(self.refresh)
+        reset_btn = QPushButton("清零")
+        reset_btn.clicked.connect(self._reset)
+        close_btn = QPushButton("关闭")
+        close_btn.clicked.connect(self.close)
+        buttons.addStretch(1)
+        for btn in (refresh_btn, reset_btn, close_btn):
+            buttons.addWidget(btn)
+        layout.addLayout(buttons)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(REFRESH_INTERVAL_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh()
+
+    @staticmethod
+    def _make_table(headers: tuple[str, ...]) -> QTableWidget:
+        table = QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        table.verticalHeader().setVisible(False)
+        return table
+
+    def showEvent(self, event) -> None:
+        super().showEvent(event)
+        self.refresh_timer.start()
+
+    def hideEvent(self, event) -> None:
+        self.refresh_timer.stop()
+        super().hideEvent(event)
+
+    def _on_enabled_toggled(self, enabled: bool) -> None:
+        if enabled:
+            self.instrumentation.enable(self.threshold_spin.value())
+        else:
+            self.instrumentation.disable()
+
+    def _on_threshold_changed(self, value: int) -> None:
+        self.instrumentation.slow_threshold_ms = float(value)
+
+    def _reset(self) -> None:
+        self.instrumentation.reset()
+        self.refresh()
+
+    def refresh(self) -> None:
+        snapshot = self.instrumentation.snapshot()
+        methods = snapshot["methods"]
+        self.methods_table.setRowCount(len(methods))
+        for r, (name, stats) in enumerate(methods.items()):
+            values = (
+                name,
+                str(stats["count"]),
+                f"{stats['mean_ms']:.2f}",
+                f"{stats['p50_ms']:.2f}",
+                f"{stats['p95_ms']:.2f}",
+                f"{stats['p99_ms']:.2f}",
+                f"{stats['max_ms']:.2f}",
+            )
+            for c, value in enumerate(values):
+                self.methods_table.setItem(r, c, QTableWidgetItem(value))
+
+        statements = snapshot["statements"]
+        self.statements_table.setRowCount(len(statements))
+        for r, stats in enumerate(statements):
+            values = (
+                stats["sql"],
+                str(stats["calls"]),
+                f"{stats['total_ms']:.2f}",
+                f"{stats['max_ms']:.2f}",
+                str(stats["rows"]),
+            )
+            for c, value in enumerate(values):
+                item = QTableWidgetItem(value)
+                if c == 0:
+                    item.setToolTip(value)
+                self.statements_table.setItem(r, c, item)
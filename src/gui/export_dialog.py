@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from datetime import date
+
+from PyQt6.QtCore import QDate
+from PyQt6.QtWidgets import (
+    QCheckBox,
+    QDateEdit,
+    QDialog,
+    QDialogButtonBox,
+    QFormLayout,
+    QHBoxLayout,
+    QMessageBox,
+)
+
+EXPORT_LOG_TYPES = ("采购", "销售")
+
+
+class ExportRangeDialog(QDialog):
+    """Pick a date range and which log types to include in a CSV export."""
+
+    def __init__(self, start: date, end: date, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("导出区间 CSV")
+        layout = QFormLayout(self)
+
+        self.start_date = QDateEdit(QDate(start.year, start.month, start.day))
+        self.start_date.setCalendarPopup(True)
+        self.end_date = QDateEdit(QDate(end.year, end.month, end.day))
+        self.end_date.setCalendarPopup(True)
+        layout.addRow("起始日期", self.start_date)
+        layout.addRow("结束日期", self.end_date)
+
+        types_row = QHBoxLayout()
+        self.type_checks: dict[str, QCheckBox] = {}
+        for log_type in EXPORT_LOG_TYPES:
+            check = QCheckBox(log_type)
+            check.setChecked(True)
+            self.type_checks[log_type] = check
+            types_row.addWidget(check)
+        types_row.addStretch(1)
+        layout.addRow("流水类型", types_row)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self._accept_if_valid)
+        buttons.rejected.connect(self.reject)
+        layout.addRow(buttons)
+
+    def _accept_if_valid(self) -> None:
+        if self.end_date.date() < self.start_date.date():
+            QMessageBox.warning(self, "提示", "结束日期不能早于起始日期")
+            return
+        if self.selected_types() == []:
+            QMessageBox.warning(self, "提示", "请至少选择一种流水类型")
+            return
+        self.accept()
+
+    def date_range(self) -> tuple[date, date]:
+        return self.start_date.date().toPyDate(), self.end_date.date().toPyDate()
+
+    def selected_types(self) -> list[str] | None:
+        """None when every type is selected (no filtering)."""
+        selected = [log_type for log_type, check in self.type_checks.items() if check.isChecked()]
+        return None if len(selected) == len(EXPORT_LOG_TYPES) else selected
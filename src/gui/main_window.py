@@ -1,10 +1,14 @@
 from __future__ import annotations
 
+import time
+from collections import deque
 from pathlib import Path
 
-from PyQt6.QtCore import QDate, Qt, QTimer
+from PyQt6.QtCore import QDate, QObject, Qt, QTimer, pyqtSignal
+from PyQt6.QtGui import QKeySequence, QShortcut
 from PyQt6.QtWidgets import (
     QAbstractItemView,
+    QApplication,
     QCompleter,
     QDateEdit,
     QFileDialog,
@@ -16,9 +20,11 @@ from PyQt6.QtWidgets import (
     QLineEdit,
     QMainWindow,
     QMessageBox,
+    QProgressBar,
     QPushButton,
     QSpinBox,
     QStackedWidget,
+    QTableView,
     QTableWidget,
     QTableWidgetItem,
     QTextEdit,
@@ -26,27 +32,72 @@ from PyQt6.QtWidgets import (
     QWidget,
 )
 
-from config import EXPIRY_WARNING_DAYS
-from src.db_manager import InventoryDB, Product, load_selected_db_path, save_selected_db_path
+from config import (
+    COMPLETION_LIMIT,
+    COMPLETION_SEARCH_DELAY_MS,
+    EXPIRY_WARNING_DAYS,
+    GUI_METRICS_EXPORT_INTERVAL_MS,
+    SCANNER_MAX_KEY_INTERVAL_MS,
+    SEARCH_LIMIT,
+)
+from src.db_instrumentation import QueryInstrumentation
+from src.db_manager import ChangeSet, InventoryDB, Product, load_selected_db_path, save_selected_db_path
+from src.gui.diagnostics_dialog import DiagnosticsDialog
+from src.gui.export_dialog import ExportRangeDialog
+from src.gui.models import (
+    CART_QTY_COLUMN,
+    CART_REMOVE_COLUMN,
+    BarcodeCompletionModel,
+    CartQuantityDelegate,
+    CartTableModel,
+    InventoryFilterProxyModel,
+    InventoryTableModel,
+)
+from src.gui.tasks import DbTaskRunner
+from src.gui.telemetry import EventLoopLagMonitor, GuiTelemetry, TelemetryOverlay
 from src.logic.inbound import InboundService
 from src.logic.outbound import OutboundService
 from src.logic.report import ReportService
+from src.scanner_handler import ScannerEventFilter
+
+
+class _DbChangeBridge(QObject):
+    # InventoryDB publishes on whichever thread wrote; the signal hops to the GUI thread.
+    changed = pyqtSignal(object)
 
 
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
-        self.db = InventoryDB(load_selected_db_path())
-        self.inbound = InboundService(self.db)
-        self.outbound = OutboundService(self.db)
-        self.report = ReportService(self.db)
-        self.cart: dict[str, int] = {}
+        self._pending_change = ChangeSet()
+        self.change_refresh_timer = QTimer(self)
+        self.change_refresh_timer.setSingleShot(True)
+        self.change_refresh_timer.setInterval(30)
+        self.change_refresh_timer.timeout.connect(self._apply_pending_changes)
+        self._db_change_bridge = _DbChangeBridge(self)
+        self._db_change_bridge.changed.connect(self._on_db_changed)
+        self._unsubscribe_db = None
+        self.tasks = DbTaskRunner(self)
+        self.tasks.busy_changed.connect(self._on_tasks_busy_changed)
+        # Kept across database switches; off until enabled in the diagnostics dialog.
+        self.query_stats = QueryInstrumentation()
+        self.diagnostics_dialog: DiagnosticsDialog | None = None
+        # Always on: a few histogram adds per action and one lag probe per interval.
+        self.telemetry = GuiTelemetry()
+        self.lag_monitor = EventLoopLagMonitor(self.telemetry, parent=self)
+        self.metrics_export_timer = QTimer(self)
+        self.metrics_export_timer.setInterval(GUI_METRICS_EXPORT_INTERVAL_MS)
+        self.metrics_export_timer.timeout.connect(self.telemetry.export)
+        self._attach_db(InventoryDB(load_selected_db_path(), instrumentation=self.query_stats))
+        self.cart = CartTableModel(self)
         self.current_customer_order_id: int | None = None
-        self._updating_cart_table = False
-        self.scan_commit_timer = QTimer(self)
-        self.scan_commit_timer.setSingleShot(True)
-        self.scan_commit_timer.setInterval(120)
-        self.scan_commit_timer.timeout.connect(self._auto_commit_scanned_barcode)
+        # (barcode, monotonic time of the scan's first key)
+        self._scan_queue: deque[tuple[str, float]] = deque()
+        self.scan_queue_timer = QTimer(self)
+        self.scan_queue_timer.setSingleShot(True)
+        self.scan_queue_timer.setInterval(0)
+        self.scan_queue_timer.timeout.connect(self._process_scan_queue)
+        self._checkout_started = 0.0
 
         self.setWindowTitle("SnackStock 库存管理")
         self.resize(1180, 760)
@@ -54,6 +105,17 @@ class MainWindow(QMainWindow):
         self._init_barcode_completer()
         self.switch_page(0)
         self.refresh_all()
+        self.db.start_background_archiving()
+
+        # Scanner bursts are captured wherever focus is while the outbound page is shown.
+        self.scanner_filter = ScannerEventFilter(self, is_active=lambda: self.page_stack.currentIndex() == 1)
+        self.scanner_filter.scanned.connect(self._on_barcode_scanned)
+        QApplication.instance().installEventFilter(self.scanner_filter)
+
+        self.telemetry_overlay = TelemetryOverlay(self.telemetry, self)
+        QShortcut(QKeySequence("Ctrl+Shift+M"), self, self.telemetry_overlay.toggle)
+        self.lag_monitor.start()
+        self.metrics_export_timer.start()
 
     def _build_ui(self) -> None:
         root = QWidget()
@@ -76,6 +138,9 @@ class MainWindow(QMainWindow):
             btn.clicked.connect(lambda _, i=index: self.switch_page(i))
             nav.addWidget(btn)
         nav.addStretch(1)
+        self.diagnostics_btn = QPushButton("诊断")
+        self.diagnostics_btn.clicked.connect(self.show_diagnostics)
+        nav.addWidget(self.diagnostics_btn)
         main_layout.addLayout(nav)
 
         self.page_stack = QStackedWidget()
@@ -85,6 +150,16 @@ class MainWindow(QMainWindow):
         self.page_stack.addWidget(self._build_customer_orders_page())
         main_layout.addWidget(self.page_stack)
 
+        self.busy_label = QLabel("后台处理中…")
+        self.busy_bar = QProgressBar()
+        self.busy_bar.setRange(0, 0)
+        self.busy_bar.setMaximumWidth(160)
+        self.busy_cancel_btn = QPushButton("取消")
+        self.busy_cancel_btn.clicked.connect(self.cancel_background_tasks)
+        for widget in (self.busy_label, self.busy_bar, self.busy_cancel_btn):
+            widget.setVisible(False)
+            self.statusBar().addPermanentWidget(widget)
+
     def _build_inbound_page(self) -> QWidget:
         page = QWidget()
         layout = QGridLayout(page)
@@ -193,6 +268,10 @@ class MainWindow(QMainWindow):
         btn = QPushButton("新增/更新商品")
         btn.clicked.connect(self.save_product)
         form.addRow(btn)
+
+        self.btn_import_products = QPushButton("导入商品档案(CSV)")
+        self.btn_import_products.clicked.connect(self.import_products_csv)
+        form.addRow(self.btn_import_products)
         return box
 
     def _build_stock_in_box(self) -> QGroupBox:
@@ -211,12 +290,15 @@ class MainWindow(QMainWindow):
 
         self.btn_stock_in = QPushButton("确认入库")
         self.btn_stock_in.clicked.connect(self.stock_in_once)
+        self.btn_import_stock_in = QPushButton("导入入库单(CSV)")
+        self.btn_import_stock_in.clicked.connect(self.import_stock_in_csv)
 
         form.addRow("条码", self.inbound_scan_barcode)
         form.addRow("数量", self.inbound_scan_qty)
         form.addRow("批次", self.inbound_scan_batch)
         form.addRow("过期日期", self.inbound_scan_expiry)
         form.addRow(self.btn_stock_in)
+        form.addRow(self.btn_import_stock_in)
         return box
 
     def _build_stock_out_box(self) -> QGroupBox:
@@ -238,7 +320,6 @@ class MainWindow(QMainWindow):
         self.scan_barcode_input = QLineEdit()
         self.scan_barcode_input.setPlaceholderText("扫码枪输入后按回车，直接加入购物车(数量=1)")
         self.scan_barcode_input.returnPressed.connect(self.add_scanned_once)
-        self.scan_barcode_input.textEdited.connect(self._on_scan_barcode_edited)
 
         form.addRow("手动条码", self.manual_barcode_input)
         form.addRow("手动数量", self.manual_qty)
@@ -250,9 +331,17 @@ class MainWindow(QMainWindow):
         box = QGroupBox("出库购物车")
         layout = QVBoxLayout(box)
 
-        self.cart_table = QTableWidget(0, 5)
-        self.cart_table.setHorizontalHeaderLabels(["条码", "名称", "数量", "单价", "操作"])
+        self.cart_table = QTableView()
+        self.cart_table.setModel(self.cart)
+        self.cart_table.setItemDelegateForColumn(CART_QTY_COLUMN, CartQuantityDelegate(self.cart_table))
+        self.cart_table.setEditTriggers(
+            QAbstractItemView.EditTrigger.DoubleClicked
+            | QAbstractItemView.EditTrigger.SelectedClicked
+            | QAbstractItemView.EditTrigger.AnyKeyPressed
+        )
         self.cart_table.horizontalHeader().setStretchLastSection(True)
+        self.cart_table.clicked.connect(self._on_cart_cell_clicked)
+        self.cart.total_changed.connect(self._show_cart_total)
         layout.addWidget(self.cart_table)
 
         row = QHBoxLayout()
@@ -290,14 +379,17 @@ class MainWindow(QMainWindow):
 
         search_row = QHBoxLayout()
         self.inventory_search = QLineEdit()
-        self.inventory_search.setPlaceholderText("搜索条码/名称/分类")
+        self.inventory_search.setPlaceholderText("搜索条码/名称/分类/拼音首字母")
         self.inventory_search.textChanged.connect(self._apply_inventory_filter)
         search_row.addWidget(QLabel("搜索"))
         search_row.addWidget(self.inventory_search, 1)
         layout.addLayout(search_row)
 
-        self.inventory_table = QTableWidget(0, 5)
-        self.inventory_table.setHorizontalHeaderLabels(["条码", "名称", "分类", "库存", "安全库存"])
+        self.inventory_model = InventoryTableModel(self)
+        self.inventory_proxy = InventoryFilterProxyModel(self)
+        self.inventory_proxy.setSourceModel(self.inventory_model)
+        self.inventory_table = QTableView()
+        self.inventory_table.setModel(self.inventory_proxy)
         self.inventory_table.horizontalHeader().setStretchLastSection(True)
         self.inventory_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
         self.inventory_table.setSortingEnabled(True)
@@ -324,7 +416,10 @@ class MainWindow(QMainWindow):
         report_row.addWidget(QLabel("报表日期"))
         report_row.addWidget(self.report_date)
         report_row.addWidget(self.refresh_outbound_btn)
+        self.export_range_btn = QPushButton("导出区间 CSV")
+        self.export_range_btn.clicked.connect(self.export_range_csv)
         report_row.addWidget(self.export_btn)
+        report_row.addWidget(self.export_range_btn)
         report_row.addStretch(1)
         layout.addLayout(report_row)
 
@@ -339,19 +434,71 @@ class MainWindow(QMainWindow):
         return box
 
     def _init_barcode_completer(self) -> None:
-        self.barcode_completer = QCompleter([], self)
-        self.barcode_completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
-        self.barcode_completer.setFilterMode(Qt.MatchFlag.MatchStartsWith)
-        self.barcode_completer.setCompletionMode(QCompleter.CompletionMode.PopupCompletion)
+        # Matching happens in InventoryDB's prefix index; the completer only shows the top hits.
+        self.barcode_completion_model = BarcodeCompletionModel(self)
+        self.barcode_completer = QCompleter(self.barcode_completion_model, self)
+        self.barcode_completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self.barcode_completer.setCompletionRole(Qt.ItemDataRole.UserRole)
         self.manual_barcode_input.setCompleter(self.barcode_completer)
-
-    def refresh_barcode_completer(self) -> None:
-        self.barcode_completer.model().setStringList(self.db.list_product_barcodes())
+        # Full-text hits are fetched off the GUI thread once typing pauses.
+        self.completion_search_timer = QTimer(self)
+        self.completion_search_timer.setSingleShot(True)
+        self.completion_search_timer.setInterval(COMPLETION_SEARCH_DELAY_MS)
+        self.completion_search_timer.timeout.connect(self._start_completion_search)
+        # Re-offers completions when a fast burst stops short of a scan.
+        self._burst_text = ""
+        self.burst_settle_timer = QTimer(self)
+        self.burst_settle_timer.setSingleShot(True)
+        self.burst_settle_timer.setInterval(SCANNER_MAX_KEY_INTERVAL_MS + 10)
+        self.burst_settle_timer.timeout.connect(self._on_burst_settled)
 
     def _on_manual_barcode_edited(self, text: str) -> None:
+        self.completion_search_timer.stop()
+        self.tasks.cancel("completion_search")
         if not text:
             return
-        self.barcode_completer.setCompletionPrefix(text)
+        if self.scanner_filter.buffer.in_burst():
+            # Keep the popup out of the way so the scanner's Enter reaches the filter.
+            self.barcode_completer.popup().hide()
+            self._burst_text = text
+            self.burst_settle_timer.start()
+            return
+        # Barcode/name prefixes come from the in-memory index right away; ranked
+        # full-text hits (substrings, pinyin initials) fill up the list later.
+        entries = self.db.complete_products(text)
+        self.barcode_completion_model.set_entries(entries)
+        self.barcode_completer.complete()
+        if len(entries) < COMPLETION_LIMIT:
+            self.completion_search_timer.start()
+
+    def _on_burst_settled(self) -> None:
+        # A completed scan puts the field back, so only an unchanged text means
+        # the burst was quick typing.
+        text = self.manual_barcode_input.text()
+        if text == self._burst_text and not self.scanner_filter.buffer.in_burst():
+            self._on_manual_barcode_edited(text)
+
+    def _start_completion_search(self) -> None:
+        text = self.manual_barcode_input.text()
+        if not text or self.scanner_filter.buffer.in_burst():
+            return
+        self.tasks.submit(
+            "completion_search",
+            self.db.search_products,
+            text,
+            limit=COMPLETION_LIMIT,
+            on_success=lambda rows, text=text: self._merge_completion_hits(text, rows),
+        )
+
+    def _merge_completion_hits(self, text: str, rows) -> None:
+        if self.manual_barcode_input.text() != text or self.scanner_filter.buffer.in_burst():
+            return
+        entries = self.barcode_completion_model.entries()
+        seen = {barcode for barcode, _ in entries}
+        for row in rows:
+            if row["barcode"] not in seen and len(entries) < COMPLETION_LIMIT:
+                entries.append((str(row["barcode"]), str(row["name"])))
+        self.barcode_completion_model.set_entries(entries)
         self.barcode_completer.complete()
 
     def select_database_file(self) -> None:
@@ -367,21 +514,66 @@ class MainWindow(QMainWindow):
 
         target = Path(selected_path)
         try:
-            new_db = InventoryDB(target)
+            new_db = InventoryDB(target, instrumentation=self.query_stats)
         except Exception as exc:
             self._warn(f"数据库切换失败: {exc}")
             return
 
-        self.db = new_db
-        self.inbound = InboundService(self.db)
-        self.outbound = OutboundService(self.db)
-        self.report = ReportService(self.db)
+        old_db = self.db
+        self.tasks.drain()
+        self._attach_db(new_db)
+        old_db.close()
         self.cart.clear()
         save_selected_db_path(target)
 
         self.refresh_all()
+        self.db.start_background_archiving()
         self._info(f"已切换数据库: {target}")
 
+    def _attach_db(self, db: InventoryDB) -> None:
+        if self._unsubscribe_db is not None:
+            self._unsubscribe_db()
+        self.db = db
+        self.inbound = InboundService(self.db)
+        self.outbound = OutboundService(self.db)
+        self.report = ReportService(self.db)
+        self._unsubscribe_db = self.db.subscribe(self._db_change_bridge.changed.emit)
+
+    def _on_tasks_busy_changed(self, busy: bool) -> None:
+        if not busy:
+            self.busy_label.setText("后台处理中…")
+            self.busy_bar.setRange(0, 0)
+        self.busy_label.setVisible(busy)
+        self.busy_bar.setVisible(busy)
+        self.busy_cancel_btn.setVisible(busy and self.tasks.has_cancellable())
+
+    def cancel_background_tasks(self) -> None:
+        self.tasks.cancel_all()
+        self.statusBar().showMessage("已取消", 3000)
+
+    def _on_db_changed(self, change: ChangeSet) -> None:
+        # Coalesce bursts of writes into one refresh pass.
+        self._pending_change.merge(change)
+        self.change_refresh_timer.start()
+
+    def _apply_pending_changes(self) -> None:
+        change, self._pending_change = self._pending_change, ChangeSet()
+        if change.everything:
+            self.refresh_all()
+            return
+
+        if change.barcodes:
+            self.inventory_model.update_rows(self.db.list_products_with_stock(change.barcodes))
+            self.refresh_warnings()
+        if change.catalog_barcodes & self.cart.barcodes():
+            self.refresh_cart_table()
+        if change.catalog_barcodes and self.inventory_search.text().strip():
+            self._apply_inventory_filter()
+        if self.report_date.date().toPyDate().isoformat() in change.days:
+            self.refresh_report_section()
+        if self.customer_order_date.date().toPyDate().isoformat() in change.days:
+            self.refresh_customer_orders()
+
     def save_product(self) -> None:
         barcode = self.product_barcode.text().strip()
         name = self.product_name.text().strip()
@@ -407,7 +599,6 @@ class MainWindow(QMainWindow):
         self.db.upsert_product(product)
         self._reset_product_form()
         self._info("商品保存成功")
-        self.refresh_all()
 
     def stock_in_once(self) -> None:
         barcode = self.inbound_scan_barcode.text().strip()
@@ -428,7 +619,75 @@ class MainWindow(QMainWindow):
 
         self._reset_stock_in_form()
         self._info("入库成功")
-        self.refresh_all()
+
+    def import_stock_in_csv(self) -> None:
+        path, _ = QFileDialog.getOpenFileName(self, "选择入库单", "", "CSV (*.csv)")
+        if not path:
+            return
+
+        # Each chunk commits on its own, so an import always runs to the end.
+        self.btn_import_stock_in.setEnabled(False)
+        self.tasks.submit(
+            "stock_in_import",
+            self.inbound.import_stock_in_csv,
+            path,
+            cancellable=False,
+            on_progress=self._show_import_progress,
+            on_success=self._on_stock_in_imported,
+            on_error=self._on_stock_in_import_failed,
+        )
+
+    def _show_import_progress(self, done: int, total: int) -> None:
+        percent = done * 100 // max(total, 1)
+        self.busy_label.setText(f"导入中 {percent}%")
+        self.busy_bar.setRange(0, 100)
+        self.busy_bar.setValue(percent)
+
+    def _on_stock_in_imported(self, result) -> None:
+        self.btn_import_stock_in.setEnabled(True)
+        self._show_import_result([f"已入库 {result.imported} 行"], result.errors)
+
+    def _on_stock_in_import_failed(self, exc: Exception) -> None:
+        self.btn_import_stock_in.setEnabled(True)
+        self._warn(f"导入失败: {exc}")
+
+    def import_products_csv(self) -> None:
+        path, _ = QFileDialog.getOpenFileName(self, "选择商品档案", "", "CSV (*.csv)")
+        if not path:
+            return
+
+        self.btn_import_products.setEnabled(False)
+        self.tasks.submit(
+            "catalog_import",
+            self.inbound.import_products_csv,
+            path,
+            cancellable=False,
+            on_progress=self._show_import_progress,
+            on_success=self._on_products_imported,
+            on_error=self._on_products_import_failed,
+        )
+
+    def _on_products_imported(self, result) -> None:
+        self.btn_import_products.setEnabled(True)
+        summary = (
+            f"新增 {result.inserted} / 更新 {result.updated} / 未变 {result.unchanged}，"
+            f"用时 {result.seconds:.1f} 秒（约 {result.rows_per_second:.0f} 行/秒）"
+        )
+        self._show_import_result([summary], result.errors)
+
+    def _on_products_import_failed(self, exc: Exception) -> None:
+        self.btn_import_products.setEnabled(True)
+        self._warn(f"导入失败: {exc}")
+
+    def _show_import_result(self, lines: list[str], errors: list[tuple[int, str]]) -> None:
+        if not errors:
+            self._info("\n".join(lines))
+            return
+        lines.append(f"跳过 {len(errors)} 行:")
+        lines.extend(f"第 {line_no} 行: {message}" for line_no, message in errors[:20])
+        if len(errors) > 20:
+            lines.append("…")
+        self._warn("\n".join(lines))
 
     def _reset_product_form(self) -> None:
         self.product_barcode.clear()
@@ -454,20 +713,30 @@ class MainWindow(QMainWindow):
         self._add_to_cart(self.scan_barcode_input.text().strip(), 1)
         self.scan_barcode_input.clear()
 
-    def _on_scan_barcode_edited(self, text: str) -> None:
-        if not text:
-            self.scan_commit_timer.stop()
-            return
-        # Barcode scanners usually input very fast; commit when input settles briefly.
-        self.scan_commit_timer.start()
-
-    def _auto_commit_scanned_barcode(self) -> None:
-        code = self.scan_barcode_input.text().strip()
-        if not code:
-            return
-        self.add_scanned_once()
+    def _on_barcode_scanned(self, code: str) -> None:
+        # The burst was also typed into the focused field; take it back out.
+        self.scanner_filter.restore_burst_target()
+        started = self.scanner_filter.buffer.last_scan_started_at
+        self._scan_queue.append((code, time.monotonic() if started is None else started))
+        self.scan_queue_timer.start()
+
+    def _process_scan_queue(self) -> None:
+        missing: list[str] = []
+        while self._scan_queue:
+            barcode, scan_started = self._scan_queue.popleft()
+            product = self.db.get_product(barcode)
+            if product:
+                self.cart.add(barcode, product["name"], float(product["retail_price"]), 1)
+                self.telemetry.record_since("scan_to_cart", scan_started)
+            else:
+                missing.append(barcode)
+        if missing:
+            self.switch_page(0)
+            self.product_barcode.setText(missing[0])
+            self._warn(f"商品不存在，请先在入库页创建商品档案: {', '.join(missing)}")
 
     def _add_to_cart(self, barcode: str, quantity: int) -> None:
+        started = time.monotonic()
         if not barcode:
             self._warn("请先扫码或输入条码")
             return
@@ -479,21 +748,12 @@ class MainWindow(QMainWindow):
             self._warn("商品不存在，请先在入库页创建商品档案")
             return
 
-        self.cart[barcode] = self.cart.get(barcode, 0) + max(1, quantity)
-        self.refresh_cart_table()
-
-    def _on_cart_qty_changed(self, barcode: str, quantity: int) -> None:
-        if self._updating_cart_table:
-            return
-        if quantity <= 0:
-            self.cart.pop(barcode, None)
-        else:
-            self.cart[barcode] = quantity
-        self.update_cart_total()
+        self.cart.add(barcode, product["name"], float(product["retail_price"]), max(1, quantity))
+        self.telemetry.record_since("add_to_cart", started)
 
-    def _remove_cart_item(self, barcode: str) -> None:
-        self.cart.pop(barcode, None)
-        self.refresh_cart_table()
+    def _on_cart_cell_clicked(self, index) -> None:
+        if index.column() == CART_REMOVE_COLUMN:
+            self.cart.remove(self.cart.barcode_at(index.row()))
 
     def checkout_cart(self) -> None:
         received_text = self.received_amount_input.text().strip()
@@ -505,118 +765,95 @@ class MainWindow(QMainWindow):
                 self._warn("实收金额必须是数字")
                 return
 
-        try:
-            result = self.outbound.checkout(self.cart, received_amount=received_amount)
-        except Exception as exc:
-            self._warn(str(exc))
-            return
+        # Scanning may continue while the checkout commits; only the snapshot is sold.
+        snapshot = self.cart.quantities()
+        self.checkout_btn.setEnabled(False)
+        self._checkout_started = time.monotonic()
+        self.tasks.submit(
+            "checkout",
+            self.outbound.checkout,
+            snapshot,
+            received_amount=received_amount,
+            cancellable=False,
+            on_success=lambda result: self._on_checkout_done(snapshot, result),
+            on_error=self._on_checkout_failed,
+        )
 
-        self.cart.clear()
+    def _on_checkout_done(self, snapshot: dict[str, int], result: dict[str, float]) -> None:
+        self.telemetry.record_since("checkout", self._checkout_started)
+        self.checkout_btn.setEnabled(True)
+        self.cart.subtract(snapshot)
         self.received_amount_input.clear()
         self.summary_label.setText(
             f"应收: {result['total_due']:.2f}  实收: {result['total_received']:.2f}  抹零: {result['discount']:.2f}  毛利润: {result['profit']:.2f}"
         )
         self._info("结算完成")
-        self.refresh_all()
+
+    def _on_checkout_failed(self, exc: Exception) -> None:
+        self.telemetry.record_since("checkout", self._checkout_started)
+        self.checkout_btn.setEnabled(True)
+        self._warn(str(exc))
 
     def refresh_all(self) -> None:
-        self.db_path_label.setText(str(self.db.db_path))
-        self.refresh_inventory_table()
-        self.refresh_cart_table()
-        self.refresh_warnings()
-        self.refresh_report_section()
-        self.refresh_customer_orders()
-        self.refresh_barcode_completer()
+        with self.telemetry.measure("refresh_all"):
+            self.db_path_label.setText(str(self.db.db_path))
+            self.refresh_inventory_table()
+            self.refresh_cart_table()
+            self.refresh_warnings()
+            self.refresh_report_section()
+            self.refresh_customer_orders()
+            self.barcode_completion_model.set_entries([])
+        # Build the completion index off the GUI thread before the first keystroke needs it.
+        self.tasks.submit("product_index", self.db.load_product_index)
 
     def refresh_inventory_table(self) -> None:
-        rows = self.db.list_products_with_stock()
-
-        self.inventory_table.setSortingEnabled(False)
-        self.inventory_table.setRowCount(len(rows))
-        for r, row in enumerate(rows):
-            self.inventory_table.setItem(r, 0, QTableWidgetItem(row["barcode"]))
-            self.inventory_table.setItem(r, 1, QTableWidgetItem(row["name"]))
-            self.inventory_table.setItem(r, 2, QTableWidgetItem(row["category"]))
-            self.inventory_table.setItem(r, 3, QTableWidgetItem(str(row["current_stock"])))
-            self.inventory_table.setItem(r, 4, QTableWidgetItem(str(row["min_stock"])))
-        self.inventory_table.setSortingEnabled(True)
-
-        self._apply_inventory_filter(self.inventory_search.text())
-
-    def _apply_inventory_filter(self, keyword: str) -> None:
-        normalized = keyword.strip().lower()
-        for r in range(self.inventory_table.rowCount()):
-            if not normalized:
-                self.inventory_table.setRowHidden(r, False)
-                continue
-
-            values = [
-                self.inventory_table.item(r, 0).text() if self.inventory_table.item(r, 0) else "",
-                self.inventory_table.item(r, 1).text() if self.inventory_table.item(r, 1) else "",
-                self.inventory_table.item(r, 2).text() if self.inventory_table.item(r, 2) else "",
-            ]
-            matched = any(normalized in value.lower() for value in values)
-            self.inventory_table.setRowHidden(r, not matched)
+        self.inventory_model.set_rows(self.db.list_products_with_stock())
+        if self.inventory_search.text().strip():
+            self._apply_inventory_filter()
+
+    def _apply_inventory_filter(self, *_args) -> None:
+        keyword = self.inventory_search.text().strip()
+        if not keyword:
+            self.tasks.cancel("inventory_search")
+            self.inventory_proxy.set_matches(None)
+            return
+        self.tasks.submit(
+            "inventory_search",
+            self.db.search_products,
+            keyword,
+            limit=max(SEARCH_LIMIT, self.inventory_model.rowCount()),
+            on_success=lambda rows: self.inventory_proxy.set_matches({str(row["barcode"]) for row in rows}),
+            on_error=lambda exc: self._warn(f"搜索失败: {exc}"),
+        )
 
     def refresh_cart_table(self) -> None:
-        barcodes = list(self.cart.keys())
-
-        self._updating_cart_table = True
-        try:
-            self.cart_table.setRowCount(len(barcodes))
-            for r, barcode in enumerate(barcodes):
-                product = self.db.get_product(barcode)
-                name = product["name"] if product else "未知商品"
-                price = float(product["retail_price"]) if product else 0.0
-                qty = int(self.cart[barcode])
-
-                self.cart_table.setItem(r, 0, QTableWidgetItem(barcode))
-                self.cart_table.setItem(r, 1, QTableWidgetItem(name))
-                self.cart_table.setItem(r, 3, QTableWidgetItem(f"{price:.2f}"))
-
-                qty_spin = QSpinBox()
-                qty_spin.setRange(1, 999999)
-                qty_spin.setValue(max(1, qty))
-                qty_spin.valueChanged.connect(
-                    lambda value, b=barcode: self._on_cart_qty_changed(b, value)
-                )
-                self.cart_table.setCellWidget(r, 2, qty_spin)
-
-                remove_btn = QPushButton("移除")
-                remove_btn.clicked.connect(lambda _, b=barcode: self._remove_cart_item(b))
-                self.cart_table.setCellWidget(r, 4, remove_btn)
-        finally:
-            self._updating_cart_table = False
-        self.update_cart_total()
-
-    def update_cart_total(self) -> None:
-        total = 0.0
-        for barcode, qty in self.cart.items():
+        """Re-read name and price of every cart line, e.g. after a catalog edit."""
+        for barcode in self.cart.barcodes():
             product = self.db.get_product(barcode)
-            if not product:
-                continue
-            total += float(product["retail_price"]) * int(qty)
+            if product:
+                self.cart.update_product(barcode, product["name"], float(product["retail_price"]))
+
+    def _show_cart_total(self, total: float) -> None:
         self.cart_total_label.setText(f"应收总额: {total:.2f}")
 
     def refresh_warnings(self) -> None:
         _, _, lines = self._collect_warnings()
         self.warning_text.setText("\n".join(lines))
 
-    def refresh_daily_report(self) -> None:
+    def refresh_report_section(self, *_args) -> None:
         selected = self.report_date.date().toPyDate()
-        report = self.report.daily_report(for_date=selected)
+        report = self.report
+        self.tasks.submit(
+            "report",
+            lambda: (report.daily_report(for_date=selected), report.outbound_transactions(for_date=selected)),
+            on_success=lambda result: self._show_report_section(selected, *result),
+            on_error=lambda exc: self._warn(f"报表加载失败: {exc}"),
+        )
+
+    def _show_report_section(self, selected, report: dict[str, float], rows: list[dict]) -> None:
         self.daily_label.setText(
             f"日报({selected.isoformat()}): 营业额 {report['revenue']:.2f} / 进货额 {report['purchase_cost']:.2f} / 毛利润 {report['gross_profit']:.2f}"
         )
-
-    def refresh_report_section(self, *_args) -> None:
-        self.refresh_daily_report()
-        self.refresh_outbound_records()
-
-    def refresh_outbound_records(self) -> None:
-        selected = self.report_date.date().toPyDate()
-        rows = self.report.outbound_transactions(for_date=selected)
-
         self.outbound_records_table.setRowCount(len(rows))
         for r, row in enumerate(rows):
             qty = -int(row["change_qty"])
@@ -632,8 +869,15 @@ class MainWindow(QMainWindow):
 
     def refresh_customer_orders(self, *_args) -> None:
         selected = self.customer_order_date.date().toPyDate()
-        rows = self.report.customer_orders(for_date=selected)
+        self.tasks.submit(
+            "customer_orders",
+            self.report.customer_orders,
+            for_date=selected,
+            on_success=self._show_customer_orders,
+            on_error=lambda exc: self._warn(f"订单加载失败: {exc}"),
+        )
 
+    def _show_customer_orders(self, rows: list[dict]) -> None:
         self.current_customer_order_id = None
         self.customer_order_id_label.setText("-")
         self.customer_name_input.clear()
@@ -675,7 +919,18 @@ class MainWindow(QMainWindow):
             self.customer_order_table.item(row_index, 4).text() if self.customer_order_table.item(row_index, 4) else ""
         )
 
-        items = self.report.customer_order_items(order_id)
+        self.customer_items_text.setText("加载中…")
+        self.tasks.submit(
+            "customer_order_items",
+            self.report.customer_order_items,
+            order_id,
+            on_success=lambda items: self._show_customer_order_items(order_id, items),
+            on_error=lambda exc: self._warn(f"订单明细加载失败: {exc}"),
+        )
+
+    def _show_customer_order_items(self, order_id: int, items: list[dict]) -> None:
+        if order_id != self.current_customer_order_id:
+            return
         lines = [
             f"{item['name']}({item['barcode']}) x {item['quantity']} @ {float(item['unit_retail_price']):.2f} = {float(item['line_due']):.2f}"
             for item in items
@@ -697,19 +952,40 @@ class MainWindow(QMainWindow):
                 self._warn("实收金额必须是数字")
                 return
 
-        try:
-            self.report.update_customer_order(
-                customer_order_id=self.current_customer_order_id,
-                customer=customer_value,
-                total_received=received_value,
-            )
-        except Exception as exc:
-            self._warn(str(exc))
-            return
+        self.customer_order_save_btn.setEnabled(False)
+        self.tasks.submit(
+            "customer_order_save",
+            self.report.update_customer_order,
+            customer_order_id=self.current_customer_order_id,
+            customer=customer_value,
+            total_received=received_value,
+            cancellable=False,
+            on_success=lambda _: self._on_customer_order_saved(),
+            on_error=self._on_customer_order_save_failed,
+        )
 
+    def _on_customer_order_saved(self) -> None:
+        self.customer_order_save_btn.setEnabled(True)
         self._info("补录保存成功")
-        self.refresh_customer_orders()
-        self.refresh_report_section()
+
+    def _on_customer_order_save_failed(self, exc: Exception) -> None:
+        self.customer_order_save_btn.setEnabled(True)
+        self._warn(str(exc))
+
+    def closeEvent(self, event) -> None:
+        QApplication.instance().removeEventFilter(self.scanner_filter)
+        self.tasks.drain()
+        self.db.close()
+        self.query_stats.disable()
+        self.lag_monitor.stop()
+        self.telemetry.export()
+        super().closeEvent(event)
+
+    def show_diagnostics(self) -> None:
+        if self.diagnostics_dialog is None:
+            self.diagnostics_dialog = DiagnosticsDialog(self.query_stats, self)
+        self.diagnostics_dialog.show()
+        self.diagnostics_dialog.raise_()
 
     def _warn(self, msg: str) -> None:
         QMessageBox.warning(self, "提示", msg)
@@ -752,13 +1028,42 @@ class MainWindow(QMainWindow):
         if not folder:
             return
 
-        try:
-            path = self.report.export_daily_report_csv(
-                for_date=selected,
-                output_dir=folder,
-            )
-        except Exception as exc:
-            self._warn(f"导出失败: {exc}")
+        self._submit_export(self.report.export_daily_report_csv, for_date=selected, output_dir=folder)
+
+    def export_range_csv(self) -> None:
+        selected = self.report_date.date().toPyDate()
+        dialog = ExportRangeDialog(selected.replace(day=1), selected, self)
+        if dialog.exec() != ExportRangeDialog.DialogCode.Accepted:
             return
+        folder = QFileDialog.getExistingDirectory(self, "选择导出目录")
+        if not folder:
+            return
+
+        start, end = dialog.date_range()
+        self._submit_export(
+            self.report.export_range_report_csv,
+            start,
+            end,
+            output_dir=folder,
+            types=dialog.selected_types(),
+        )
+
+    def _submit_export(self, export_fn, *args, **kwargs) -> None:
+        # Rows stream straight from SQLite into the file; cancelling stops the
+        # writer between rows and removes the partial file.
+        self.tasks.submit(
+            "export",
+            export_fn,
+            *args,
+            pass_cancel_check=True,
+            on_progress=self._show_export_progress,
+            on_success=lambda path: self._info(f"导出成功: {path}"),
+            on_error=lambda exc: self._warn(f"导出失败: {exc}"),
+            **kwargs,
+        )
+        self.busy_cancel_btn.setVisible(True)
 
-        self._info(f"导出成功: {path}")
+    def _show_export_progress(self, done: int, total: int) -> None:
+        self.busy_label.setText(f"导出中 {done}/{total}")
+        self.busy_bar.setRange(0, max(total, 1))
+        self.busy_bar.setValue(done)
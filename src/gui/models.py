@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+from typing import Any, Iterable, Mapping
+
+from PyQt6.QtCore import (
+    QAbstractListModel,
+    QAbstractTableModel,
+    QModelIndex,
+    QSortFilterProxyModel,
+    Qt,
+    pyqtSignal,
+)
+from PyQt6.QtWidgets import QSpinBox, QStyledItemDelegate
+
+INVENTORY_COLUMNS = ("barcode", "name", "category", "current_stock", "min_stock")
+INVENTORY_HEADERS = ("条码", "名称", "分类", "库存", "安全库存")
+
+CART_HEADERS = ("条码", "名称", "数量", "单价", "操作")
+CART_QTY_COLUMN = 2
+CART_REMOVE_COLUMN = 4
+CART_MAX_QTY = 999999
+
+
+class InventoryTableModel(QAbstractTableModel):
+    """
+    Inventory rows kept as compact tuples with a barcode -> row index.
+    set_rows() diffs against what is already shown and only emits dataChanged
+    for rows whose values actually changed.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: list[tuple[Any, ...]] = []
+        self._index: dict[str, int] = {}
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(INVENTORY_COLUMNS)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        value = self._rows[index.row()][index.column()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return str(value)
+        if role == Qt.ItemDataRole.UserRole:
+            # Raw value so the proxy sorts stock columns numerically.
+            return value
+        return None
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return INVENTORY_HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def barcode_at(self, row: int) -> str:
+        return str(self._rows[row][0])
+
+    def row_of(self, barcode: str) -> int | None:
+        return self._index.get(barcode)
+
+    @staticmethod
+    def _to_tuple(row: Mapping[str, Any]) -> tuple[Any, ...]:
+        return (
+            str(row["barcode"]),
+            str(row["name"]),
+            str(row["category"] or ""),
+            int(row["current_stock"]),
+            int(row["min_stock"]),
+        )
+
+    def set_rows(self, rows: Iterable[Mapping[str, Any]]) -> None:
+        """Replace the full row set; unchanged rows are left untouched."""
+        incoming = [self._to_tuple(row) for row in rows]
+        incoming_barcodes = {values[0] for values in incoming}
+        if any(barcode not in incoming_barcodes for barcode in self._index):
+            # Rows disappeared (e.g. another database was opened): start over.
+            self.beginResetModel()
+            self._rows = incoming
+            self._index = {values[0]: r for r, values in enumerate(incoming)}
+            self.endResetModel()
+            return
+        self.update_rows(incoming)
+
+    def update_rows(self, rows: Iterable[Mapping[str, Any] | tuple[Any, ...]]) -> None:
+        """Update or append the given rows, leaving every other row untouched."""
+        appended: list[tuple[Any, ...]] = []
+        last_column = len(INVENTORY_COLUMNS) - 1
+        for row in rows:
+            values = row if isinstance(row, tuple) else self._to_tuple(row)
+            r = self._index.get(values[0])
+            if r is None:
+                appended.append(values)
+                continue
+            if self._rows[r] != values:
+                self._rows[r] = values
+                self.dataChanged.emit(self.index(r, 0), self.index(r, last_column))
+
+        if appended:
+            first = len(self._rows)
+            self.beginInsertRows(QModelIndex(), first, first + len(appended) - 1)
+            for values in appended:
+                self._index[values[0]] = len(self._rows)
+                self._rows.append(values)
+            self.endInsertRows()
+
+
+class InventoryFilterProxyModel(QSortFilterProxyModel):
+    """Shows only the barcodes matched by InventoryDB.search_products (None = all)."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._matches: set[str] | None = None
+        self.setSortRole(Qt.ItemDataRole.UserRole)
+
+    def set_matches(self, barcodes: set[str] | None) -> None:
+        if barcodes == self._matches:
+            return
+        self._matches = barcodes
+        self.invalidateRowsFilter()
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:
+        if self._matches is None:
+            return True
+        return self.sourceModel().barcode_at(source_row) in self._matches
+
+
+class CartTableModel(QAbstractTableModel):
+    """
+    Outbound cart lines [barcode, name, qty, price_cents] with a barcode -> row
+    index and a running total in cents. Adding a scan appends one row or bumps
+    one quantity cell, so the per-scan cost does not grow with the cart.
+    """
+
+    total_changed = pyqtSignal(float)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._lines: list[list[Any]] = []
+        self._index: dict[str, int] = {}
+        self._total_cents = 0
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._lines)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(CART_HEADERS)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        barcode, name, qty, price_cents = self._lines[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.EditRole and column == CART_QTY_COLUMN:
+            return qty
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if column == 0:
+            return barcode
+        if column == 1:
+            return name
+        if column == CART_QTY_COLUMN:
+            return str(qty)
+        if column == 3:
+            return f"{price_cents / 100:.2f}"
+        return "移除"
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return CART_HEADERS[section]
+        return super().headerData(section, orientation, role)
+
+    def flags(self, index: QModelIndex) -> Qt.ItemFlag:
+        flags = super().flags(index)
+        if index.isValid() and index.column() == CART_QTY_COLUMN:
+            flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    def setData(self, index: QModelIndex, value: Any, role: int = Qt.ItemDataRole.EditRole) -> bool:
+        if role != Qt.ItemDataRole.EditRole or index.column() != CART_QTY_COLUMN:
+            return False
+        qty = int(value)
+        if qty < 1:
+            return False
+        self.set_quantity(self._lines[index.row()][0], qty)
+        return True
+
+    @property
+    def total(self) -> float:
+        return self._total_cents / 100
+
+    def __bool__(self) -> bool:
+        return bool(self._lines)
+
+    def __contains__(self, barcode: object) -> bool:
+        return barcode in self._index
+
+    def barcode_at(self, row: int) -> str:
+        return self._lines[row][0]
+
+    def barcodes(self) -> set[str]:
+        return set(self._index)
+
+    def quantities(self) -> dict[str, int]:
+        return {line[0]: line[2] for line in self._lines}
+
+    def add(self, barcode: str, name: str, retail_price: float, quantity: int) -> None:
+        r = self._index.get(barcode)
+        if r is None:
+            price_cents = round(float(retail_price) * 100)
+            r = len(self._lines)
+            self.beginInsertRows(QModelIndex(), r, r)
+            self._lines.append([barcode, name, quantity, price_cents])
+            self._index[barcode] = r
+            self.endInsertRows()
+            self._add_to_total(price_cents * quantity)
+            return
+        self.set_quantity(barcode, self._lines[r][2] + quantity)
+
+    def set_quantity(self, barcode: str, quantity: int) -> None:
+        r = self._index.get(barcode)
+        if r is None:
+            return
+        if quantity <= 0:
+            self.remove(barcode)
+            return
+        line = self._lines[r]
+        quantity = min(quantity, CART_MAX_QTY)
+        if quantity == line[2]:
+            return
+        delta = quantity - line[2]
+        line[2] = quantity
+        cell = self.index(r, CART_QTY_COLUMN)
+        self.dataChanged.emit(cell, cell)
+        self._add_to_total(line[3] * delta)
+
+    def update_product(self, barcode: str, name: str, retail_price: float) -> None:
+        r = self._index.get(barcode)
+        if r is None:
+            return
+        line = self._lines[r]
+        price_cents = round(float(retail_price) * 100)
+        old_cents = line[3]
+        line[1] = name
+        line[3] = price_cents
+        self.dataChanged.emit(self.index(r, 0), self.index(r, len(CART_HEADERS) - 1))
+        self._add_to_total((price_cents - old_cents) * line[2])
+
+    def remove(self, barcode: str) -> None:
+        r = self._index.pop(barcode, None)
+        if r is None:
+            return
+        self.beginRemoveRows(QModelIndex(), r, r)
+        line = self._lines.pop(r)
+        for later in self._lines[r:]:
+            self._index[later[0]] -= 1
+        self.endRemoveRows()
+        self._add_to_total(-line[3] * line[2])
+
+    def subtract(self, quantities: Mapping[str, int]) -> None:
+        """Take sold quantities off the cart, keeping lines scanned since."""
+        for barcode, qty in quantities.items():
+            r = self._index.get(barcode)
+            if r is not None:
+                self.set_quantity(barcode, self._lines[r][2] - qty)
+
+    def clear(self) -> None:
+        self.beginResetModel()
+        self._lines.clear()
+        self._index.clear()
+        self.endResetModel()
+        self._total_cents = 0
+        self.total_changed.emit(0.0)
+
+    def _add_to_total(self, delta_cents: int) -> None:
+        if delta_cents:
+            self._total_cents += delta_cents
+            self.total_changed.emit(self.total)
+
+
+class CartQuantityDelegate(QStyledItemDelegate):
+    """Spin box editor for the cart quantity column."""
+
+    def createEditor(self, parent, option, index):
+        editor = QSpinBox(parent)
+        editor.setRange(1, CART_MAX_QTY)
+        return editor
+
+
+class BarcodeCompletionModel(QAbstractListModel):
+    """
+    The few (barcode, name) matches for the current input. The popup shows
+    "barcode  name"; UserRole carries the barcode that completion inserts.
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._entries: list[tuple[str, str]] = []
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._entries)
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        barcode, name = self._entries[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"{barcode}  {name}"
+        if role == Qt.ItemDataRole.UserRole:
+            return barcode
+        return None
+
+    def entries(self) -> list[tuple[str, str]]:
+        return list(self._entries)
+
+    def set_entries(self, entries: list[tuple[str, str]]) -> None:
+        self.beginResetModel()
+        self._entries = entries
+        self.endResetModel()
@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Callable
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from config import DB_READER_POOL_SIZE
+
+
+class _TaskSignals(QObject):
+    succeeded = pyqtSignal(object)
+    failed = pyqtSignal(object)
+    progress = pyqtSignal(int, int)
+    finished = pyqtSignal()
+
+
+class DbTask(QRunnable):
+    """
+    Runs fn(*args, **kwargs) on a pool thread and reports back through Qt signals,
+    which are delivered on the GUI thread. Cancellation is cooperative: a cancelled
+    task never reports a result, and fn can poll task.is_cancelled to stop early.
+    With pass_cancel_check, fn also receives should_cancel=task.is_cancelled; with
+    pass_progress, it receives progress=task.report_progress.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        cancellable: bool = True,
+        pass_cancel_check: bool = False,
+        pass_progress: bool = False,
+        **kwargs: Any,
+    ):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.signals = _TaskSignals()
+        self.cancellable = cancellable
+        self._cancelled = threading.Event()
+        if pass_cancel_check:
+            kwargs["should_cancel"] = self.is_cancelled
+        if pass_progress:
+            kwargs["progress"] = self.report_progress
+        self._fn = fn
+        self._args = args
+        self._kwargs = kwargs
+
+    def cancel(self) -> None:
+        # Writes (e.g. checkout) must always report back once submitted.
+        if self.cancellable:
+            self._cancelled.set()
+
+    def is_cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def report_progress(self, done: int, total: int) -> None:
+        if not self.is_cancelled():
+            self.signals.progress.emit(done, total)
+
+    def run(self) -> None:
+        try:
+            if self.is_cancelled():
+                return
+            try:
+                result = self._fn(*self._args, **self._kwargs)
+            except Exception as exc:
+                if not self.is_cancelled():
+                    self.signals.failed.emit(exc)
+                return
+            if not self.is_cancelled():
+                self.signals.succeeded.emit(result)
+        finally:
+            self.signals.finished.emit()
+
+
+class DbTaskRunner(QObject):
+    """
+    Submits DbTasks to a private thread pool. Tasks sharing a key replace each
+    other (the older one is cancelled), so e.g. flipping through report dates only
+    ever applies the latest result. busy_changed fires when the queue drains/fills.
+    The pool runs one thread fewer than there are pooled readers, so however long
+    tasks (e.g. a streaming export) hold theirs, one is left for the GUI thread.
+    """
+
+    busy_changed = pyqtSignal(bool)
+
+    def __init__(self, parent: QObject | None = None, max_threads: int = DB_READER_POOL_SIZE - 1):
+        super().__init__(parent)
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max(1, max_threads))
+        self._active: dict[int, DbTask] = {}
+        self._by_key: dict[str, DbTask] = {}
+
+    def submit(
+        self,
+        key: str,
+        fn: Callable[..., Any],
+        *args: Any,
+        on_success: Callable[[Any], None] | None = None,
+        on_error: Callable[[Exception], None] | None = None,
+        on_progress: Callable[[int, int], None] | None = None,
+        cancellable: bool = True,
+        pass_cancel_check: bool = False,
+        **kwargs: Any,
+    ) -> DbTask:
+        """
+        With pass_cancel_check, fn also receives should_cancel=task.is_cancelled;
+        with on_progress, it receives progress=task.report_progress.
+        """
+        previous = self._by_key.get(key)
+        if previous is not None:
+            previous.cancel()
+
+        task = DbTask(
+            fn,
+            *args,
+            cancellable=cancellable,
+            pass_cancel_check=pass_cancel_check,
+            pass_progress=on_progress is not None,
+            **kwargs,
+        )
+        if on_progress is not None:
+            task.signals.progress.connect(on_progress)
+        if on_success is not None:
+            task.signals.succeeded.connect(on_success)
+        if on_error is not None:
+            task.signals.failed.connect(on_error)
+        task.signals.finished.connect(lambda t=task, k=key: self._on_finished(k, t))
+
+        was_busy = self.is_busy()
+        self._active[id(task)] = task
+        self._by_key[key] = task
+        self._pool.start(task)
+        if not was_busy:
+            self.busy_changed.emit(True)
+        return task
+
+    def is_busy(self) -> bool:
+        return bool(self._active)
+
+    def has_cancellable(self) -> bool:
+        return any(task.cancellable for task in self._active.values())
+
+    def cancel(self, key: str) -> None:
+        task = self._by_key.get(key)
+        if task is not None:
+            task.cancel()
+
+    def cancel_all(self) -> None:
+        for task in self._active.values():
+            task.cancel()
+
+    def drain(self) -> None:
+        """Cancel what can be cancelled and block until every task has returned."""
+        self.cancel_all()
+        self._pool.waitForDone()
+
+    def _on_finished(self, key: str, task: DbTask) -> None:
+        self._active.pop(id(task), None)
+        if self._by_key.get(key) is task:
+            del self._by_key[key]
+        if not self._active:
+            self.busy_changed.emit(False)
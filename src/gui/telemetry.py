@@ -0,0 +1,180 @@
+"""
+GUI responsiveness telemetry: latency histograms for the cashier's hot paths
+(scan to cart row, manual add, checkout, refresh_all) and an event-loop lag
+probe, shown in a developer overlay and exported to a JSON metrics file.
+
+Times come from time.monotonic, the clock BarcodeScannerBuffer stamps keys with,
+so a scan is measured from its first keystroke.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator
+
+from PyQt6.QtCore import QObject, Qt, QTimer
+from PyQt6.QtWidgets import QLabel, QWidget
+
+from config import GUI_LAG_PROBE_INTERVAL_MS, GUI_METRICS_PATH, GUI_STALL_THRESHOLD_MS
+from src.db_instrumentation import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+OVERLAY_REFRESH_MS = 1000
+# Display order in the overlay and the metrics file.
+METRIC_LABELS = {
+    "scan_to_cart": "扫码→购物车",
+    "add_to_cart": "手动加购",
+    "checkout": "结算",
+    "refresh_all": "全量刷新",
+    "event_loop_lag": "事件循环延迟",
+}
+
+
+class GuiTelemetry:
+    """Histograms per metric plus event-loop stall counters; GUI thread only."""
+
+    def __init__(self, metrics_path: Path = GUI_METRICS_PATH, stall_threshold_ms: float = GUI_STALL_THRESHOLD_MS):
+        self.metrics_path = Path(metrics_path)
+        self.stall_threshold_ms = float(stall_threshold_ms)
+        self.started_at = datetime.now()
+        self.histograms = {name: LatencyHistogram() for name in METRIC_LABELS}
+        self.stalls = 0
+        self.stalled_ms = 0.0
+        self._recorded_since_export = False
+
+    def record(self, name: str, ms: float) -> None:
+        self.histograms[name].add(ms)
+        self._recorded_since_export = True
+
+    def record_since(self, name: str, started: float) -> None:
+        self.record(name, (time.monotonic() - started) * 1e3)
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record_since(name, started)
+
+    def record_lag(self, ms: float) -> None:
+        self.record("event_loop_lag", ms)
+        if ms >= self.stall_threshold_ms:
+            self.stalls += 1
+            self.stalled_ms += ms
+
+    def reset(self) -> None:
+        self.histograms = {name: LatencyHistogram() for name in METRIC_LABELS}
+        self.stalls = 0
+        self.stalled_ms = 0.0
+        self.started_at = datetime.now()
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "since": self.started_at.isoformat(timespec="seconds"),
+            "stall_threshold_ms": self.stall_threshold_ms,
+            "stalls": self.stalls,
+            "stalled_ms": round(self.stalled_ms, 1),
+            "metrics": {
+                name: {key: round(value, 3) for key, value in histogram.snapshot().items()}
+                for name, histogram in self.histograms.items()
+            },
+        }
+
+    def export(self, path: Path | None = None, force: bool = False) -> Path | None:
+        """
+        Write the snapshot as JSON; skipped when nothing was recorded since the
+        last export. A write error is logged, never raised: this runs from a timer.
+        """
+        if not (force or self._recorded_since_export):
+            return None
+        path = Path(path or self.metrics_path)
+        data = {"exported": datetime.now().isoformat(timespec="seconds"), **self.snapshot()}
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+            tmp.replace(path)
+        except OSError:
+            logger.exception("could not write GUI metrics to %s", path)
+            return None
+        self._recorded_since_export = False
+        return path
+
+
+class EventLoopLagMonitor(QObject):
+    """
+    A precise timer that should fire every interval_ms; how late each tick
+    arrives is how long the event loop was busy with something else.
+    """
+
+    def __init__(self, telemetry: GuiTelemetry, interval_ms: int = GUI_LAG_PROBE_INTERVAL_MS, parent=None):
+        super().__init__(parent)
+        self.telemetry = telemetry
+        self.interval = interval_ms / 1000
+        self._expected_at = 0.0
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.setInterval(interval_ms)
+        self.timer.timeout.connect(self._on_tick)
+
+    def start(self) -> None:
+        self._expected_at = time.monotonic() + self.interval
+        self.timer.start()
+
+    def stop(self) -> None:
+        self.timer.stop()
+
+    def _on_tick(self) -> None:
+        now = time.monotonic()
+        self.telemetry.record_lag(max(0.0, (now - self._expected_at) * 1e3))
+        self._expected_at = now + self.interval
+
+
+class TelemetryOverlay(QLabel):
+    """Developer overlay pinned to the parent's top-right corner (Ctrl+Shift+M)."""
+
+    def __init__(self, telemetry: GuiTelemetry, parent: QWidget):
+        super().__init__(parent)
+        self.telemetry = telemetry
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.setTextFormat(Qt.TextFormat.PlainText)
+        self.setStyleSheet(
+            "background: rgba(0, 0, 0, 170); color: #e8e8e8; font-family: monospace; padding: 6px;"
+        )
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(OVERLAY_REFRESH_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.hide()
+
+    def toggle(self) -> None:
+        if self.isVisible():
+            self.refresh_timer.stop()
+            self.hide()
+            return
+        self.refresh()
+        self.show()
+        self.raise_()
+        self.refresh_timer.start()
+
+    def refresh(self) -> None:
+        snapshot = self.telemetry.snapshot()
+        lines = [f"{'':10s} {'次数':>6s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'最大':>8s}"]
+        for name, stats in snapshot["metrics"].items():
+            lines.append(
+                f"{METRIC_LABELS[name]:10s} {stats['count']:6d} {stats['p50_ms']:8.1f} "
+                f"{stats['p95_ms']:8.1f} {stats['p99_ms']:8.1f} {stats['max_ms']:8.1f}"
+            )
+        lines.append(
+            f"卡顿(≥{snapshot['stall_threshold_ms']:.0f}ms): {snapshot['stalls']} 次, "
+            f"共 {snapshot['stalled_ms'] / 1000:.1f}s  单位 ms"
+        )
+        self.setText("\n".join(lines))
+        self.adjustSize()
+        parent = self.parentWidget()
+        self.move(max(0, parent.width() - self.width() - 8), 8)
@@ -1,4 +1,79 @@
-from src.db_manager import InventoryDB
+import csv
+import io
+import time
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+from typing import Callable
+
+from config import CATALOG_IMPORT_CHUNK_SIZE, STOCK_IN_IMPORT_CHUNK_SIZE
+from src.db_manager import InventoryDB, Product, StockInLine
+
+# Accepted header names for each column of a delivery CSV.
+STOCK_IN_CSV_COLUMNS = {
+    "barcode": ("条码", "barcode"),
+    "quantity": ("数量", "quantity"),
+    "batch_no": ("批次", "batch_no"),
+    "expiry_date": ("过期日期", "expiry_date"),
+}
+STOCK_IN_CSV_REQUIRED = ("barcode", "quantity")
+
+# Catalog CSV columns; a missing optional column keeps existing products' stored
+# values and gives new products CATALOG_DEFAULTS.
+CATALOG_CSV_COLUMNS = {
+    "barcode": ("条码", "barcode"),
+    "name": ("名称", "name"),
+    "category": ("分类", "category"),
+    "purchase_price": ("进价", "purchase_price"),
+    "retail_price": ("售价", "retail_price"),
+    "min_stock": ("安全库存", "min_stock"),
+}
+CATALOG_CSV_REQUIRED = ("barcode", "name", "purchase_price", "retail_price")
+CATALOG_DEFAULTS = {"category": "", "min_stock": 5}
+
+
+@dataclass
+class StockInImportResult:
+    imported: int = 0
+    # (CSV line number, message) for every rejected line.
+    errors: list[tuple[int, str]] = field(default_factory=list)
+
+
+@dataclass
+class CatalogImportResult:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    errors: list[tuple[int, str]] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def rows(self) -> int:
+        return self.inserted + self.updated + self.unchanged
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+
+def _column_positions(
+    header: list[str], columns: dict[str, tuple[str, ...]], required: tuple[str, ...]
+) -> dict[str, int]:
+    names = [name.strip().lower() for name in header]
+    positions = {}
+    for key, aliases in columns.items():
+        for alias in aliases:
+            if alias in names:
+                positions[key] = names.index(alias)
+                break
+    missing = [columns[key][0] for key in required if key not in positions]
+    if missing:
+        raise ValueError(f"CSV 缺少列: {', '.join(missing)}")
+    return positions
+
+
+def _row_values(row: list[str], positions: dict[str, int]) -> dict[str, str]:
+    return {key: row[i].strip() if i < len(row) else "" for key, i in positions.items()}
 
 
 class InboundService:
@@ -19,3 +94,152 @@ class InboundService:
             batch_no=batch_no,
             expiry_date=expiry_date,
         )
+
+    def import_stock_in_csv(
+        self,
+        path: Path | str,
+        chunk_size: int = STOCK_IN_IMPORT_CHUNK_SIZE,
+        progress: Callable[[int, int], None] | None = None,
+    ) -> StockInImportResult:
+        """
+        Stream a delivery CSV (条码, 数量 and optional 批次, 过期日期 columns) into
+        stock_in_many, one transaction per chunk_size lines, so memory stays flat
+        however long the file is. progress(bytes_read, file_size) follows each chunk.
+        """
+        path = Path(path)
+        size = path.stat().st_size
+        result = StockInImportResult()
+
+        with path.open("rb") as raw:
+            reader = csv.reader(io.TextIOWrapper(raw, encoding="utf-8-sig", newline=""))
+            header = next(reader, None)
+            if header is None:
+                return result
+            positions = _column_positions(header, STOCK_IN_CSV_COLUMNS, STOCK_IN_CSV_REQUIRED)
+
+            chunk: list[StockInLine] = []
+            line_numbers: list[int] = []
+
+            def flush() -> None:
+                errors = self.db.stock_in_many(chunk)
+                result.imported += len(chunk) - len(errors)
+                result.errors.extend((line_numbers[position], message) for position, message in errors)
+                chunk.clear()
+                line_numbers.clear()
+                if progress is not None:
+                    progress(raw.tell(), size)
+
+            for row in reader:
+                line_no = reader.line_num
+                if not any(cell.strip() for cell in row):
+                    continue
+                values = _row_values(row, positions)
+                try:
+                    quantity = int(values["quantity"])
+                except ValueError:
+                    result.errors.append((line_no, f"数量无效: {values['quantity']}"))
+                    continue
+                expiry_date = values.get("expiry_date") or None
+                if expiry_date is not None:
+                    try:
+                        expiry_date = date.fromisoformat(expiry_date).isoformat()
+                    except ValueError:
+                        result.errors.append((line_no, f"过期日期无效: {expiry_date}"))
+                        continue
+                chunk.append(
+                    StockInLine(
+                        barcode=values["barcode"],
+                        quantity=quantity,
+                        batch_no=values.get("batch_no") or None,
+                        expiry_date=expiry_date,
+                    )
+                )
+                line_numbers.append(line_no)
+                if len(chunk) >= chunk_size:
+                    flush()
+            if chunk:
+                flush()
+
+        result.errors.sort()
+        if progress is not None:
+            progress(size, size)
+        return result
+
+    def import_products_csv(
+        self,
+        path: Path | str,
+        chunk_size: int = CATALOG_IMPORT_CHUNK_SIZE,
+        progress: Callable[[int, int], None] | None = None,
+    ) -> CatalogImportResult:
+        """
+        Stream a catalog CSV (条码, 名称, 进价, 售价 and optional 分类, 安全库存)
+        into upsert_products chunk by chunk. Only new or changed products are
+        written; the result counts each kind and times the whole import. A barcode
+        is imported from its first line only; repeats are reported as errors.
+        """
+        path = Path(path)
+        size = path.stat().st_size
+        result = CatalogImportResult()
+        started = time.perf_counter()
+
+        with path.open("rb") as raw:
+            reader = csv.reader(io.TextIOWrapper(raw, encoding="utf-8-sig", newline=""))
+            header = next(reader, None)
+            if header is None:
+                return result
+            positions = _column_positions(header, CATALOG_CSV_COLUMNS, CATALOG_CSV_REQUIRED)
+            keep_fields = [key for key in CATALOG_DEFAULTS if key not in positions]
+
+            chunk: list[Product] = []
+            # Existing products whose 安全库存 cell is empty keep their stored value.
+            keep_min_stock: dict[str, tuple[str, ...]] = {}
+            first_lines: dict[str, int] = {}
+
+            def flush() -> None:
+                counts = self.db.upsert_products(
+                    chunk, keep_fields=keep_fields, keep_fields_by_barcode=keep_min_stock
+                )
+                result.inserted += counts["inserted"]
+                result.updated += counts["updated"]
+                result.unchanged += counts["unchanged"]
+                chunk.clear()
+                keep_min_stock.clear()
+                if progress is not None:
+                    progress(raw.tell(), size)
+
+            for row in reader:
+                line_no = reader.line_num
+                if not any(cell.strip() for cell in row):
+                    continue
+                values = {**CATALOG_DEFAULTS, **_row_values(row, positions)}
+                if not values["barcode"] or not values["name"]:
+                    result.errors.append((line_no, "条码和名称不能为空"))
+                    continue
+                try:
+                    product = Product(
+                        barcode=values["barcode"],
+                        name=values["name"],
+                        category=values["category"],
+                        purchase_price=float(values["purchase_price"]),
+                        retail_price=float(values["retail_price"]),
+                        min_stock=int(values["min_stock"] or CATALOG_DEFAULTS["min_stock"]),
+                    )
+                except ValueError:
+                    result.errors.append((line_no, "价格或安全库存不是数字"))
+                    continue
+                first_line = first_lines.setdefault(product.barcode, line_no)
+                if first_line != line_no:
+                    result.errors.append((line_no, f"条码重复，已跳过（首次出现在第 {first_line} 行）"))
+                    continue
+                if "min_stock" in positions and not values["min_stock"]:
+                    keep_min_stock[product.barcode] = ("min_stock",)
+                chunk.append(product)
+                if len(chunk) >= chunk_size:
+                    flush()
+            if chunk:
+                flush()
+
+        result.seconds = time.perf_counter() - started
+        if progress is not None:
+            progress(size, size)
+        return result
@@ -1,12 +1,105 @@
-from datetime import date
+from contextlib import contextmanager
+from datetime import date, timedelta
 from pathlib import Path
 import csv
-from typing import Any
+import os
+from typing import Any, Callable, Iterable, Iterator
 
 from config import REPORTS_DIR
 from src.db_manager import InventoryDB
 
 
+class ReportCancelled(Exception):
+    pass
+
+
+REPORT_PERIODS = ("day", "week", "month", "quarter", "year")
+
+# How many transaction rows are written between progress callbacks.
+EXPORT_PROGRESS_EVERY = 500
+
+TRANSACTION_HEADER = ["时间", "类型", "条码", "商品", "数量变动", "进价", "售价", "金额影响(销售额口径)"]
+
+
+def period_bounds(period: str, anchor: date | None = None) -> tuple[date, date]:
+    """Inclusive (start, end) dates of the day/week/month/quarter/year containing anchor."""
+    day = anchor or date.today()
+    if period == "day":
+        return day, day
+    if period == "week":
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    if period == "month":
+        start = day.replace(day=1)
+    elif period == "quarter":
+        start = date(day.year, (day.month - 1) // 3 * 3 + 1, 1)
+    elif period == "year":
+        return date(day.year, 1, 1), date(day.year, 12, 31)
+    else:
+        raise ValueError(f"unknown report period: {period}")
+
+    months = 1 if period == "month" else 3
+    next_month = start.month + months
+    next_start = date(start.year + (next_month - 1) // 12, (next_month - 1) % 12 + 1, 1)
+    return start, next_start - timedelta(days=1)
+
+
+def _write_transaction_rows(
+    writer: Any,
+    rows: Iterable[dict[str, Any]],
+    should_cancel: Callable[[], bool] | None = None,
+    progress: Callable[[int, int], None] | None = None,
+    total: int = 0,
+) -> int:
+    """Write rows as they arrive; progress(done, total) is called every EXPORT_PROGRESS_EVERY rows."""
+    writer.writerow(TRANSACTION_HEADER)
+    written = 0
+    for row in rows:
+        if should_cancel is not None and should_cancel():
+            raise ReportCancelled("导出已取消")
+        if progress is not None and written % EXPORT_PROGRESS_EVERY == 0:
+            progress(written, total)
+        written += 1
+        amount = 0.0
+        if row["type"] == "销售":
+            amount = -float(row["change_qty"]) * float(row["retail_price"])
+        writer.writerow(
+            [
+                row["timestamp"],
+                row["type"],
+                row["barcode"],
+                row["name"],
+                row["change_qty"],
+                f"{float(row['purchase_price']):.2f}",
+                f"{float(row['retail_price']):.2f}",
+                f"{amount:.2f}",
+            ]
+        )
+    if progress is not None:
+        progress(written, max(total, written))
+    return written
+
+
+@contextmanager
+def _csv_export(path: Path) -> Iterator[Any]:
+    """
+    csv.writer over a temporary file next to path that replaces path only once
+    the block completes; a cancelled or failed export leaves no partial CSV.
+    """
+    tmp = path.with_name(path.name + ".part")
+    try:
+        with tmp.open("w", encoding="utf-8-sig", newline="") as f:
+            yield csv.writer(f)
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def _types_suffix(types: Iterable[str] | None) -> str:
+    return "" if types is None else "_" + "-".join(types)
+
+
 class ReportService:
     def __init__(self, db: InventoryDB):
         self.db = db
@@ -14,6 +107,13 @@ class ReportService:
     def daily_report(self, for_date: date | None = None) -> dict[str, float]:
         return self.db.get_daily_summary(for_date=for_date)
 
+    def range_report(self, start_date: date, end_date: date) -> dict[str, float]:
+        return self.db.get_range_summary(start_date=start_date, end_date=end_date)
+
+    def period_report(self, period: str, anchor: date | None = None) -> dict[str, float]:
+        start_date, end_date = period_bounds(period, anchor)
+        return self.range_report(start_date, end_date)
+
     def outbound_transactions(self, for_date: date | None = None) -> list[dict[str, Any]]:
         rows = self.db.get_daily_transactions(for_date=for_date)
         return [row for row in rows if row["type"] == "销售"]
@@ -42,40 +142,66 @@ class ReportService:
         self,
         for_date: date | None = None,
         output_dir: Path | str | None = None,
+        should_cancel: Callable[[], bool] | None = None,
+        types: Iterable[str] | None = None,
+        progress: Callable[[int, int], None] | None = None,
     ) -> Path:
         day = for_date or date.today()
+        types = list(types) if types is not None else None
         summary = self.db.get_daily_summary(for_date=day)
-        transactions = self.db.get_daily_transactions(for_date=day)
+        total = self.db.count_logs(day, day, types) if progress is not None else 0
 
         target_dir = Path(output_dir) if output_dir else REPORTS_DIR
         target_dir.mkdir(parents=True, exist_ok=True)
-        path = target_dir / f"daily_report_{day.isoformat()}.csv"
+        path = target_dir / f"daily_report_{day.isoformat()}{_types_suffix(types)}.csv"
 
-        with path.open("w", encoding="utf-8-sig", newline="") as f:
-            writer = csv.writer(f)
+        with _csv_export(path) as writer:
             writer.writerow(["日期", day.isoformat()])
             writer.writerow(["营业额", f"{summary['revenue']:.2f}"])
             writer.writerow(["进货额", f"{summary['purchase_cost']:.2f}"])
             writer.writerow(["毛利润", f"{summary['gross_profit']:.2f}"])
             writer.writerow([])
-            writer.writerow(
-                ["时间", "类型", "条码", "商品", "数量变动", "进价", "售价", "金额影响(销售额口径)"]
-            )
+            _write_transaction_rows(writer, self.db.iter_logs(day, day, types), should_cancel, progress, total)
+        return path
+
+    def export_range_report_csv(
+        self,
+        start_date: date,
+        end_date: date,
+        output_dir: Path | str | None = None,
+        should_cancel: Callable[[], bool] | None = None,
+        types: Iterable[str] | None = None,
+        progress: Callable[[int, int], None] | None = None,
+    ) -> Path:
+        types = list(types) if types is not None else None
+        summary = self.db.get_range_summary(start_date=start_date, end_date=end_date)
+        daily_rows = self.db.list_daily_rollups(start_date=start_date, end_date=end_date)
+        total = self.db.count_logs(start_date, end_date, types) if progress is not None else 0
+
+        target_dir = Path(output_dir) if output_dir else REPORTS_DIR
+        target_dir.mkdir(parents=True, exist_ok=True)
+        path = target_dir / f"report_{start_date.isoformat()}_{end_date.isoformat()}{_types_suffix(types)}.csv"
 
-            for row in transactions:
-                amount = 0.0
-                if row["type"] == "销售":
-                    amount = -float(row["change_qty"]) * float(row["retail_price"])
+        with _csv_export(path) as writer:
+            writer.writerow(["起始日期", start_date.isoformat()])
+            writer.writerow(["结束日期", end_date.isoformat()])
+            writer.writerow(["营业额", f"{summary['revenue']:.2f}"])
+            writer.writerow(["进货额", f"{summary['purchase_cost']:.2f}"])
+            writer.writerow(["毛利润", f"{summary['gross_profit']:.2f}"])
+            writer.writerow([])
+            writer.writerow(["日期", "营业额", "进货额", "毛利润"])
+            for row in daily_rows:
+                revenue = float(row["sales_revenue"])
                 writer.writerow(
                     [
-                        row["timestamp"],
-                        row["type"],
-                        row["barcode"],
-                        row["name"],
-                        row["change_qty"],
-                        f"{float(row['purchase_price']):.2f}",
-                        f"{float(row['retail_price']):.2f}",
-                        f"{amount:.2f}",
+                        row["day"],
+                        f"{revenue:.2f}",
+                        f"{float(row['purchase_cost']):.2f}",
+                        f"{revenue - float(row['sales_cost']):.2f}",
                     ]
                 )
+            writer.writerow([])
+            _write_transaction_rows(
+                writer, self.db.iter_logs(start_date, end_date, types), should_cancel, progress, total
+            )
         return path
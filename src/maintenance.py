@@ -0,0 +1,52 @@
+"""Command-line maintenance tasks for a SnackStock database.
+
+Usage (from the project root):
+
+    python -m src.maintenance [--db PATH] rebuild-rollups
+    python -m src.maintenance [--db PATH] archive [--chunk-size N]
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+
+from config import ARCHIVE_CHUNK_SIZE
+from src.db_manager import InventoryDB, load_selected_db_path
+
+
+def _rebuild_rollups(db: InventoryDB, _args: argparse.Namespace) -> None:
+    start = time.perf_counter()
+    rows = db.rebuild_daily_rollups()
+    print(f"daily_rollups rebuilt: {rows} rows in {time.perf_counter() - start:.2f}s")
+
+
+def _archive(db: InventoryDB, args: argparse.Namespace) -> None:
+    start = time.perf_counter()
+    rows = db.archive_closed_month_logs(chunk_size=args.chunk_size)
+    print(f"archived {rows} log rows in {time.perf_counter() - start:.2f}s")
+    for row in db.get_archive_progress():
+        state = "done" if row["completed_at"] else "in progress"
+        print(f"  {row['month_key']}: {row['archived_rows']} rows, {state}")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m src.maintenance")
+    parser.add_argument("--db", type=Path, default=None, help="database file (default: last selected)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = commands.add_parser("rebuild-rollups", help="recompute daily_rollups from all history")
+    rebuild.set_defaults(handler=_rebuild_rollups)
+
+    archive = commands.add_parser("archive", help="move closed months of stock_logs into archive files")
+    archive.add_argument("--chunk-size", type=int, default=ARCHIVE_CHUNK_SIZE)
+    archive.set_defaults(handler=_archive)
+
+    args = parser.parse_args(argv)
+    with InventoryDB(args.db or load_selected_db_path()) as db:
+        args.handler(db, args)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,18 +1,128 @@
-from PyQt6.QtCore import Qt
+from __future__ import annotations
+
+import time
+from typing import Callable
+
+from PyQt6.QtCore import QEvent, QObject, Qt, pyqtSignal
 from PyQt6.QtGui import QKeyEvent
+from PyQt6.QtWidgets import QAbstractSpinBox, QApplication, QDateTimeEdit, QLineEdit
+
+from config import SCANNER_MAX_KEY_INTERVAL_MS, SCANNER_MIN_CODE_LENGTH
 
 
 class BarcodeScannerBuffer:
-    def __init__(self):
+    """
+    Collects key presses into barcodes. A pause longer than max_interval_ms
+    between keys starts a new burst, so only input arriving at scanner speed and
+    terminated by Enter yields a code.
+    """
+
+    def __init__(
+        self,
+        max_interval_ms: int = SCANNER_MAX_KEY_INTERVAL_MS,
+        min_length: int = SCANNER_MIN_CODE_LENGTH,
+    ):
         self._buffer: list[str] = []
+        self._last_key_at: float | None = None
+        # time.monotonic() of the first key of the current burst and of the
+        # last completed scan.
+        self.burst_started_at: float | None = None
+        self.last_scan_started_at: float | None = None
+        self.max_interval = max_interval_ms / 1000
+        self.min_length = min_length
+
+    def feed(self, event: QKeyEvent, now: float | None = None) -> str | None:
+        now = time.monotonic() if now is None else now
+        if self._last_key_at is None or now - self._last_key_at > self.max_interval:
+            self._buffer.clear()
+            self.burst_started_at = now
+        self._last_key_at = now
 
-    def feed(self, event: QKeyEvent) -> str | None:
         if event.key() in (Qt.Key.Key_Return, Qt.Key.Key_Enter):
             code = "".join(self._buffer).strip()
             self._buffer.clear()
-            return code if code else None
+            self._last_key_at = None
+            if len(code) < self.min_length:
+                return None
+            self.last_scan_started_at = self.burst_started_at
+            return code
 
         text = event.text()
         if text and text.isprintable():
             self._buffer.append(text)
         return None
+
+    def in_burst(self, now: float | None = None) -> bool:
+        """True while at least two keys have come in at scanner speed and the gap
+        since the last one is still within max_interval."""
+        if len(self._buffer) < 2 or self._last_key_at is None:
+            return False
+        now = time.monotonic() if now is None else now
+        return now - self._last_key_at <= self.max_interval
+
+
+def _input_state(widget: QObject | None):
+    if isinstance(widget, QLineEdit):
+        return widget.text()
+    if isinstance(widget, QDateTimeEdit):
+        return widget.dateTime()
+    if isinstance(widget, QAbstractSpinBox) and hasattr(widget, "value"):
+        return widget.value()
+    return None
+
+
+def _restore_input_state(widget: QObject, state) -> None:
+    if isinstance(widget, QLineEdit):
+        widget.setText(state)
+    elif isinstance(widget, QDateTimeEdit):
+        widget.setDateTime(state)
+    else:
+        widget.setValue(state)
+
+
+class ScannerEventFilter(QObject):
+    """
+    Application-level key filter feeding a BarcodeScannerBuffer. Keys still reach
+    the focused widget as usual; only the Enter that completes a scan is consumed
+    and reported through scanned instead. The focused input's value is noted at
+    the first key of every burst so restore_burst_target() can undo the
+    characters a scan typed into it.
+    """
+
+    scanned = pyqtSignal(str)
+
+    def __init__(self, parent: QObject | None = None, is_active: Callable[[], bool] | None = None):
+        super().__init__(parent)
+        self.buffer = BarcodeScannerBuffer()
+        self._is_active = is_active
+        self._noted_burst: float | None = None
+        self._burst_target: QObject | None = None
+        self._burst_state = None
+
+    def eventFilter(self, obj: QObject, event: QEvent) -> bool:
+        if event.type() != QEvent.Type.KeyPress:
+            return False
+        # The same key event is also seen by the window and by parents it
+        # propagates to; only count its delivery to the focus widget.
+        if obj is not QApplication.focusWidget():
+            return False
+        if self._is_active is not None and not self._is_active():
+            return False
+
+        code = self.buffer.feed(event)
+        if self.buffer.burst_started_at != self._noted_burst:
+            # First key of a new burst; the widget has not received it yet.
+            self._noted_burst = self.buffer.burst_started_at
+            self._burst_target = obj
+            self._burst_state = _input_state(obj)
+        if code is None:
+            return False
+        self.scanned.emit(code)
+        return True
+
+    def restore_burst_target(self) -> None:
+        """Put the input that received the last scan back to its pre-scan value."""
+        target, state = self._burst_target, self._burst_state
+        self._burst_target = self._burst_state = None
+        if state is not None and target is QApplication.focusWidget():
+            _restore_input_state(target, state)